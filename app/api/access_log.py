@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List
+
+
+class AccessLogger:
+    """
+    异步访问日志：请求线程只做一次 put_nowait，后台线程攒批写文件。
+    文件超过 max_bytes 时轮转为 .1 ~ .N；队列满了直接丢弃并计数，绝不阻塞请求。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 100 * 1024 * 1024,
+        backups: int = 5,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        queue_size: int = 10000,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+
+        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record: Dict[str, Any]) -> None:
+        try:
+            self._q.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, first: Dict[str, Any]) -> List[Dict[str, Any]]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._q.empty()):
+            try:
+                first = self._q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write(self._drain(first))
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch)
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self.written += len(batch)
+        except OSError:
+            self.dropped += len(batch)
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"path": self.path, "queued": self._q.qsize(), "written": self.written, "dropped": self.dropped}
+
+
+class _NullLogger:
+    def log(self, record: Dict[str, Any]) -> None:
+        return
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"path": None}
+
+
+def _make_logger():
+    path = os.getenv("ACCESS_LOG_PATH", "logs/access.jsonl")
+    if not path:
+        return _NullLogger()
+    return AccessLogger(
+        path,
+        max_bytes=int(float(os.getenv("ACCESS_LOG_MAX_MB", "100")) * 1024 * 1024),
+        backups=int(os.getenv("ACCESS_LOG_BACKUPS", "5")),
+    )
+
+
+access_log = _make_logger()
+
+
+def now_ms() -> float:
+    return time.perf_counter() * 1000
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class StageLimiter:
+    """
+    单个阶段的准入控制：最多 concurrency 个请求并发执行，
+    最多 max_queue 个请求排队，排队超过 deadline_s 就放弃。
+    拿不到名额时 slot() 产出 False，由调用方决定降级还是报错。
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, deadline_s: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.deadline_s = deadline_s
+
+        self._sem = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _acquire(self) -> bool:
+        if self._sem.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self.waiting >= self.max_queue or self.deadline_s <= 0:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+        ok = self._sem.acquire(timeout=self.deadline_s)
+        with self._lock:
+            self.waiting -= 1
+            if not ok:
+                self.timed_out += 1
+        return ok
+
+    @contextmanager
+    def slot(self) -> Iterator[bool]:
+        ok = self._acquire()
+        if ok:
+            with self._lock:
+                self.in_flight += 1
+                self.admitted += 1
+        try:
+            yield ok
+        finally:
+            if ok:
+                with self._lock:
+                    self.in_flight -= 1
+                self._sem.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+# 检索阶段很快，允许少量排队；LLM 阶段一个请求占几秒线程，默认不排队，满了直接降级
+retrieve_limiter = StageLimiter(
+    "retrieve",
+    concurrency=int(os.getenv("RETRIEVE_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("RETRIEVE_QUEUE", "32")),
+    deadline_s=float(os.getenv("RETRIEVE_DEADLINE_MS", "2000")) / 1000,
+)
+llm_limiter = StageLimiter(
+    "llm",
+    concurrency=int(os.getenv("LLM_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("LLM_QUEUE", "0")),
+    deadline_s=float(os.getenv("LLM_DEADLINE_MS", "0")) / 1000,
+)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from app.cache.redis_cache import get_redis
+
+
+def client_id(request: Request) -> str:
+    """调用方标识：X-API-Key > X-Client-Id > 客户端 IP。API Key 只存 hash，不落明文"""
+    key = request.headers.get("x-api-key")
+    if key:
+        return "key:" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    cid = request.headers.get("x-client-id")
+    if cid:
+        return cid[:64]
+    return request.client.host if request.client else "anonymous"
+
+
+# 原子地补充令牌并尝试扣减，返回 1 / 0
+_BUCKET_LUA = """
+local cap = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local v = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(v[1]) or cap
+local ts = tonumber(v[2]) or now
+tokens = math.min(cap, tokens + (now - ts) * rate)
+local ok = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  ok = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(cap / rate) + 60)
+return ok
+"""
+
+
+class TokenBucket:
+    """
+    按调用方的令牌桶：容量 capacity，每秒补充 rate 个。
+    有 Redis 时多 worker 共享一个桶，Redis 不可用时退回进程内桶。
+    只限制带 X-API-Key 的调用方：X-Client-Id 可随意伪造，IP 在反向代理 / 端口映射后是共享的，
+    按它们限额要么能绕过、要么把所有人一起限住；匿名流量的总量由 llm_limiter 的并发上限兜住。
+    """
+
+    def __init__(self, capacity: float, rate: float, prefix: str = "quota:llm"):
+        self.capacity = capacity
+        self.rate = rate
+        self.prefix = prefix
+        self._local: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, client: str) -> bool:
+        if self.capacity <= 0 or not client.startswith("key:"):
+            return True  # 未开启限额 / 非 API Key 调用方
+        r = get_redis()
+        if r:
+            try:
+                return bool(r.eval(_BUCKET_LUA, 1, f"{self.prefix}:{client}", self.capacity, self.rate, time.time()))
+            except Exception:
+                pass
+        return self._allow_local(client)
+
+    def _allow_local(self, client: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._local.get(client, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - ts) * self.rate)
+            ok = tokens >= 1
+            if ok:
+                tokens -= 1
+            self._local[client] = (tokens, now)
+            return ok
+
+
+class UsageMeter:
+    """
+    LLM 用量与费用统计：调用次数、token、费用，以及被缓存/预生成挡掉的调用次数。
+    有 Redis 时写 Redis hash（多 worker 汇总），同时保留进程内一份作为兜底。
+    """
+
+    FIELDS = ("llm_calls", "prompt_tokens", "completion_tokens", "cost", "saved_cache", "saved_precomputed", "rate_limited")
+
+    def __init__(self, price_prompt_per_m: float, price_completion_per_m: float, prefix: str = "usage"):
+        self.price_prompt = price_prompt_per_m / 1_000_000
+        self.price_completion = price_completion_per_m / 1_000_000
+        self.prefix = prefix
+        self._local: Dict[str, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+        self._lock = threading.Lock()
+
+    def _incr(self, client: str, **deltas: float) -> None:
+        with self._lock:
+            row = self._local[client]
+            for k, v in deltas.items():
+                row[k] += v
+        r = get_redis()
+        if not r:
+            return
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.sadd(f"{self.prefix}:clients", client)
+            for k, v in deltas.items():
+                pipe.hincrbyfloat(f"{self.prefix}:{client}", k, v)
+            pipe.execute()
+        except Exception:
+            return
+
+    def record_llm(self, client: str, usage: Dict[str, Any]) -> None:
+        pt = int(usage.get("prompt_tokens") or 0)
+        ct = int(usage.get("completion_tokens") or 0)
+        cost = pt * self.price_prompt + ct * self.price_completion
+        self._incr(client, llm_calls=1, prompt_tokens=pt, completion_tokens=ct, cost=cost)
+
+    def record_saved(self, client: str, source: str) -> None:
+        self._incr(client, **{f"saved_{source}": 1})
+
+    def record_rate_limited(self, client: str) -> None:
+        self._incr(client, rate_limited=1)
+
+    def _rows(self) -> Dict[str, Dict[str, float]]:
+        r = get_redis()
+        if r:
+            try:
+                clients = sorted(r.smembers(f"{self.prefix}:clients"))
+                pipe = r.pipeline(transaction=False)
+                for c in clients:
+                    pipe.hgetall(f"{self.prefix}:{c}")
+                return {
+                    c: {k: float(row.get(k, 0)) for k in self.FIELDS}
+                    for c, row in zip(clients, pipe.execute())
+                }
+            except Exception:
+                pass
+        with self._lock:
+            return {c: dict(row) for c, row in self._local.items()}
+
+    def snapshot(self, top: Optional[int] = 20) -> Dict[str, Any]:
+        rows = self._rows()
+        total = dict.fromkeys(self.FIELDS, 0.0)
+        for row in rows.values():
+            for k in self.FIELDS:
+                total[k] += row.get(k, 0)
+        avg_cost = total["cost"] / total["llm_calls"] if total["llm_calls"] else 0.0
+        saved = total["saved_cache"] + total["saved_precomputed"]
+        ranked = sorted(rows.items(), key=lambda kv: -kv[1].get("cost", 0))[:top]
+        return {
+            "total": total,
+            "llm_calls_avoided": saved,
+            # 用实际平均单次费用估算缓存省下的钱
+            "est_saved_cost": saved * avg_cost,
+            "clients": dict(ranked),
+        }
+
+
+llm_quota = TokenBucket(
+    capacity=float(os.getenv("LLM_QUOTA_BURST", "0")),
+    rate=float(os.getenv("LLM_QUOTA_PER_MIN", "10")) / 60,
+)
+usage_meter = UsageMeter(
+    price_prompt_per_m=float(os.getenv("LLM_PRICE_PROMPT_PER_M", "2")),
+    price_completion_per_m=float(os.getenv("LLM_PRICE_COMPLETION_PER_M", "8")),
+)
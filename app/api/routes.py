@@ -2,87 +2,186 @@ from __future__ import annotations
 
 import os
 import json
-from fastapi import APIRouter
+import time
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, HTTPException, Request
 
 from app.api.schemas import AskRequest, AskResponse, Candidate
-from app.cache.redis_cache import cache_get, cache_set
-from app.rag.retriever import retrieve, normalize_query
-from app.rag.vectorstore import get_collection
+from app.cache.redis_cache import ask_cache_key, cache_get, cache_set
+from app.rag.retriever import get_registry, get_tenant, search, normalize_query
+from app.rag.context import build_context
+from app.rag.tenants import DEFAULT_TENANT
+from app.rag.vectorstore import get_collection, get_index_version
 from app.rag.generator import llm_generator  
+from app.api.admission import retrieve_limiter, llm_limiter
+from app.api.quota import client_id, llm_quota, usage_meter
+from app.api.routing import routing_config
+from app.api.access_log import access_log, now_ms
 
 router = APIRouter()
 
+# full：正常检索 + 生成；cache-only：只读缓存，未命中直接返回提示，不加载模型/向量库
+SERVE_MODE = os.getenv("SERVE_MODE", "full")
+
 @router.get("/health")
 def health():
-    _ = get_collection()
-    return {"status": "ok"}
+    if SERVE_MODE == "full" and os.getenv("INDEX_BACKEND", "chroma") == "chroma":
+        _ = get_collection()
+    return {"status": "ok", "serve_mode": SERVE_MODE}
+
+@router.get("/stats")
+def stats():
+    return {
+        "routing": routing_config.to_dict(),
+        "llm_breaker": llm_generator.breaker.snapshot(),
+        "admission": {
+            "retrieve": retrieve_limiter.snapshot(),
+            "llm": llm_limiter.snapshot(),
+        },
+        "llm_usage": usage_meter.snapshot(),
+        "access_log": access_log.snapshot(),
+        "tenants": get_registry().snapshot(),
+    }
 
 @router.post("/ask", response_model=AskResponse)
-def ask(req: AskRequest):
+def ask(req: AskRequest, request: Request):
+    t0 = now_ms()
+    # 到达时间：回放按它排程，不能用完成时间（否则混进了各请求自身的耗时）
+    ts = round(time.time(), 3)
     q = normalize_query(req.question)
-    
-    # --- 1. 缓存层 (Key 包含策略版本) ---
-    cache_key = f"ask:v3:{q}:{req.rewrite}"
+    client = client_id(request)
+    tenant = req.tenant or request.headers.get("X-Tenant") or DEFAULT_TENANT
+    if tenant not in get_registry():
+        raise HTTPException(status_code=404, detail=f"未知租户: {tenant}")
+    # 各阶段耗时，请求结束后写访问日志（回放压测 / 挖热门问题用）
+    trace: Dict[str, Any] = {"cache_hit": False}
+    resp: Optional[AskResponse] = None
+    try:
+        resp = _answer(req, q, client, tenant, trace)
+        return resp
+    finally:
+        trace["total_ms"] = round(now_ms() - t0, 2)
+        access_log.log({
+            "ts": ts,
+            "query": q,
+            "rewrite": req.rewrite,
+            "candidate_answers": req.candidate_answers,
+            "client": client,
+            "tenant": tenant,
+            "mode": resp.mode if resp else "rejected",
+            "confidence": round(resp.confidence, 4) if resp else None,
+            **trace,
+        })
+
+
+def _answer(req: AskRequest, q: str, client: str, tenant: str, trace: Dict[str, Any]) -> AskResponse:
+    # --- 1. 缓存层 (Key 包含租户 + 索引版本 + 策略版本) ---
+    # 只读 meta 文件拿版本号，缓存命中时不加载该租户的索引
+    version = get_index_version(get_registry().specs[tenant].collection)
+    cache_key = ask_cache_key(tenant, version, routing_config.version, q, req.rewrite, req.candidate_answers)
+    t = now_ms()
     cached = cache_get(cache_key)
+    trace["cache_ms"] = round(now_ms() - t, 2)
     if cached:
+        trace["cache_hit"] = True
+        if cached.get("mode") == "llm":
+            # 缓存挡掉了一次付费调用
+            usage_meter.record_saved(client, "cache")
         return AskResponse(**cached)
 
+    if SERVE_MODE == "cache-only":
+        return AskResponse(
+            hit=False,
+            mode="cache_only",
+            message="当前节点仅提供缓存应答，该问题暂无缓存，请稍后重试。",
+        )
+
     # --- 2. 检索层 (Retrieve) ---
     topk = int(os.getenv("TOPK", "5"))
-    hits = retrieve(q, topk=topk)
+    # 检索阶段单独限流，排队超过 deadline 直接 503，不拖垮整个线程池
+    with retrieve_limiter.slot() as admitted:
+        if not admitted:
+            raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
+        t = now_ms()
+        # 整个请求只取一次租户索引：检索、版本号、预生成答案都来自同一个对象，
+        # 中途被淘汰 / 重新加载也不会混用两份
+        tenant_index = get_tenant(tenant)
+        hits = search(q, topk=topk, index=tenant_index)
+        trace["retrieve_ms"] = round(now_ms() - t, 2)
+
+    # 本次检索可能刚（重新）加载了租户索引：以加载时读到的版本为准，写缓存 / 查预生成答案都用它
+    if tenant_index.version != version:
+        version = tenant_index.version
+        cache_key = ask_cache_key(tenant, version, routing_config.version, q, req.rewrite, req.candidate_answers)
     
-    # 转换为 Schema 对象
-    candidates = [
-        Candidate(
-            faq_id=h.get("faq_id"),
-            title=h.get("title"),
-            score=h.get("score", 0.0),
-            question=h.get("question"),
-            answer=h.get("answer")
-        ) 
-        for h in hits
-    ]
-
-    best_score = candidates[0].score if candidates else 0.0
+    # 转换为 Schema 对象：hits 只持有行号和分数，Candidate 在这里一次性构造
+    candidates = Candidate.from_result(hits, with_answer=req.candidate_answers)
+
+    best_score = hits.best_score
+    second_score = float(hits.scores[1]) if len(hits) > 1 else 0.0
     
     # --- 3. 策略路由层 (Router) ---
-    
-    DIRECT_THRESHOLD = 0.80  # 高于此分，直接返回原文 (快)
-    MIN_THRESHOLD = 0.40     # 低于此分，认为没查到 (准)
+    # 阈值来自 config/routing.json（calibrate_routing.py 标定），除绝对分数外也看 top1-top2 差距
+    route = routing_config.route(best_score, second_score, rewrite=req.rewrite) if candidates else "fallback"
     
     # 场景 A: 命中率极高 & 用户没强制 AI -> 直通模式 (Direct)
-    if candidates and best_score >= DIRECT_THRESHOLD and not req.rewrite:
-        best = candidates[0]
-        resp = AskResponse(
-            hit=True,
-            mode="direct",
-            answer=best.answer,  # 直接用预设答案
-            confidence=best_score,
-            sources=[best],      # 来源就是这一条
-            candidates=candidates,
-            message="由知识库精确命中"
-        )
-        # 缓存 1 小时
+    if route == "direct":
+        resp = AskResponse.direct(hits, candidates)
+        # 缓存 1 小时（scripts/warm_cache.py 重建索引后会批量预热这一类）
         cache_set(cache_key, resp.model_dump(), ttl=3600)
         return resp
 
     # 场景 B: 命中率尚可 OR 强制润色 -> AI 增强模式 (RAG)
-    if candidates and best_score >= MIN_THRESHOLD:
-        # 取 Top 3 给 AI 参考
-        context_docs = hits[:3]
+    if route == "llm":
+        # 低分 / 重复答案剔除 + token 预算，最多 3 条给 AI 参考
+        packed = build_context(hits)
         
-        # 调用 DeepSeek 生成
-        # 这里会耗时 2-5s，前端需 loading
-        ai_answer = llm_generator.generate(q, context_docs)
+        # 高频问题的答案离线预生成过，同一组资料直接取，不再调 LLM
+        ai_answer = tenant_index.answers.get(version, packed.docs)
+        precomputed = ai_answer is not None
+        busy_msg = "AI 服务繁忙"
+        if precomputed:
+            usage_meter.record_saved(client, "precomputed")
+        else:
+            # 先过并发准入再扣配额，被准入挡掉的请求不消耗调用方令牌
+            with llm_limiter.slot() as admitted:
+                if admitted and not llm_quota.allow(client):
+                    # 超出调用方配额：和并发满一样降级，不调用 LLM
+                    usage_meter.record_rate_limited(client)
+                    busy_msg = "AI 调用配额已用完"
+                elif admitted:
+                    # 调用 DeepSeek 生成
+                    # 这里会耗时 2-5s，前端需 loading
+                    t = now_ms()
+                    # 熔断 / 超时 / 上游报错时返回 None，走下面不缓存的降级分支
+                    ai_answer = llm_generator.generate(
+                        q, packed.docs, on_usage=lambda u: usage_meter.record_llm(client, u), fallback=False
+                    )
+                    trace["llm_ms"] = round(now_ms() - t, 2)
+
+        # LLM 并发已满 / 配额用完 / 上游失败：不排队，直接返回知识库原文兜底，也不写缓存
+        if ai_answer is None:
+            # rewrite=true 但本身已精确命中：退回直通模式
+            if routing_config.is_direct(best_score, second_score):
+                return AskResponse.direct(hits, candidates, message=f"{busy_msg}，已返回知识库精确命中原文")
+            return AskResponse(
+                hit=True,
+                mode="degraded",
+                answer=llm_generator._mock_generate(packed.docs, error_msg=busy_msg),
+                confidence=best_score,
+                sources=[Candidate.from_hit(d) for d in packed.docs],
+                candidates=candidates,
+                message=f"{busy_msg}，已返回知识库原文"
+            )
         
         resp = AskResponse(
             hit=True,
             mode="llm",
             answer=ai_answer,
             confidence=best_score,
-            sources=candidates[:3], # 来源是前3条
+            sources=[Candidate.from_hit(d) for d in packed.docs], # 来源是实际送进 prompt 的资料
             candidates=candidates,
-            message="由 AI 综合知识库回答"
+            message="由 AI 综合知识库回答（预生成）" if precomputed else "由 AI 综合知识库回答"
         )
         # AI 结果缓存 2 小时 (省钱)
         cache_set(cache_key, resp.model_dump(), ttl=7200)
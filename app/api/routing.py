@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass, fields
+
+
+@dataclass(frozen=True)
+class RoutingConfig:
+    """
+    /ask 的路由阈值，由 scripts/calibrate_routing.py 在评测集上标定后写入 json。
+    - top1 >= direct_threshold：直通
+    - 或 top1 >= margin_floor 且 top1 - top2 >= margin：第一名明显领先，也直通
+    - top1 >= min_threshold：LLM 增强
+    - 否则兜底
+    """
+
+    version: str = "default"
+    direct_threshold: float = 0.80
+    min_threshold: float = 0.40
+    margin: float = 0.0
+    margin_floor: float = 1.01  # > 1 即关闭 margin 规则
+
+    def is_direct(self, top1: float, top2: float) -> bool:
+        if top1 >= self.direct_threshold:
+            return True
+        return self.margin > 0 and top1 >= self.margin_floor and top1 - top2 >= self.margin
+
+    def route(self, top1: float, top2: float, rewrite: bool = False) -> str:
+        if not rewrite and self.is_direct(top1, top2):
+            return "direct"
+        if top1 >= self.min_threshold:
+            return "llm"
+        return "fallback"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def load_routing_config(path: str | None = None) -> RoutingConfig:
+    path = path or os.getenv("ROUTING_CONFIG", "config/routing.json")
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        known = {f.name for f in fields(RoutingConfig)}
+        return RoutingConfig(**{k: v for k, v in data.items() if k in known})
+    # 没有标定文件时沿用 .env 里的阈值
+    return RoutingConfig(
+        version="env",
+        direct_threshold=float(os.getenv("THRESHOLD", "0.80")),
+        min_threshold=float(os.getenv("MIN_THRESHOLD", "0.40")),
+    )
+
+
+# 服务启动时加载一次
+routing_config = load_routing_config()
@@ -1,9 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, List, Mapping, Optional
 
 class AskRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=500)
     rewrite: bool = False
+    # False 时 candidates 不带 answer 全文，减小响应体
+    candidate_answers: bool = True
+    # 多租户：不填时读 X-Tenant 请求头，都没有就是 default
+    tenant: Optional[str] = Field(None, max_length=64)
 
 class Candidate(BaseModel):
     faq_id: Optional[str] = None
@@ -12,6 +16,32 @@ class Candidate(BaseModel):
     question: Optional[str] = None
     answer: Optional[str] = None
 
+    @classmethod
+    def from_hit(cls, h: Mapping[str, Any], with_answer: bool = True) -> "Candidate":
+        return cls(
+            faq_id=h["faq_id"],
+            title=h["title"],
+            score=float(h["score"]),
+            question=h["question"],
+            answer=h["answer"] if with_answer else None,
+        )
+
+    @classmethod
+    def from_result(cls, result: Any, with_answer: bool = True) -> List["Candidate"]:
+        """直接按列从 FaqTable 取字段，不经过中间 dict / Hit 对象"""
+        t = result.table
+        answers = t.answer if with_answer else None
+        return [
+            cls(
+                faq_id=t.faq_id[r],
+                title=t.title[r],
+                score=s,
+                question=t.question[r],
+                answer=answers[r] if answers else None,
+            )
+            for r, s in zip(result.rows.tolist(), result.scores.tolist())
+        ]
+
 class AskResponse(BaseModel):
     hit: bool
     mode: str = "unknown"
@@ -20,3 +50,17 @@ class AskResponse(BaseModel):
     confidence: float = 0.0
     sources: List[Candidate] = Field(default_factory=list)
     candidates: List[Candidate] = Field(default_factory=list)
+
+    @classmethod
+    def direct(cls, hits: Any, candidates: List[Candidate], message: str = "由知识库精确命中") -> "AskResponse":
+        """直通应答：/ask 和 warm_cache.py 共用，保证预热进缓存的内容和线上一致"""
+        best = hits[0]
+        return cls(
+            hit=True,
+            mode="direct",
+            answer=best["answer"],  # 直接用预设答案
+            confidence=hits.best_score,
+            sources=[Candidate.from_hit(best)],  # 来源就是这一条
+            candidates=candidates,
+            message=message,
+        )
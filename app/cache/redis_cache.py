@@ -3,19 +3,32 @@ from __future__ import annotations
 import json
 import os
 from functools import lru_cache
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
 
-import redis
+if TYPE_CHECKING:
+    import redis
 
 
 @lru_cache(maxsize=1)
-def get_redis() -> Optional[redis.Redis]:
+def get_redis() -> Optional["redis.Redis"]:
     url = os.getenv("REDIS_URL", "")
     if not url:
         return None
+    import redis  # 没配 REDIS_URL 的进程不加载 redis 客户端
+    # 显式连接池：上限和线程池大小对齐，连接用满时最多等 0.2 秒而不是直接报错
     # 0.2秒没反应直接放弃
+    timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.2"))
     try:
-        r = redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.2)
+        pool = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "64")),
+            timeout=timeout,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+            health_check_interval=30,
+            decode_responses=True,
+        )
+        r = redis.Redis(connection_pool=pool)
         r.ping()
         return r
     except Exception:
@@ -43,3 +56,29 @@ def cache_set(key: str, value: dict, ttl: int = 3600) -> None:
         r.setex(key, ttl, json.dumps(value, ensure_ascii=False))
     except Exception:
         return
+
+
+def ask_cache_key(
+    tenant: str, index_version: str, routing_version: str, q: str, rewrite: bool, candidate_answers: bool
+) -> str:
+    """/ask 的缓存 key：按租户隔离，带索引版本，重建索引后自动换命名空间，旧 key 靠 TTL 过期"""
+    return f"ask:{tenant}:{index_version}:{routing_version}:{q}:{rewrite}:{int(candidate_answers)}"
+
+
+def cache_set_many(items: Iterable[Tuple[str, Dict[str, Any], int]], chunk: int = 500) -> int:
+    """pipeline 批量 SETEX，每 chunk 条一次往返；返回写入条数"""
+    r = get_redis()
+    if not r:
+        return 0
+    n = 0
+    try:
+        pipe = r.pipeline(transaction=False)
+        for key, value, ttl in items:
+            pipe.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            n += 1
+            if n % chunk == 0:
+                pipe.execute()
+        pipe.execute()
+    except Exception:
+        pass
+    return n
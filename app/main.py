@@ -1,6 +1,23 @@
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+# 先加载 .env，后面各模块 import 时读到的配置才是全的
+load_dotenv()
+
 from fastapi import FastAPI
 from app.api.routes import router
 
-app = FastAPI(title="HR FAQ RAG", version="0.1.0")
-app.include_router(router)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # SERVE_MODE=cache-only 的进程只读缓存，不加载模型/向量库
+    if os.getenv("WARMUP", "1") == "1" and os.getenv("SERVE_MODE", "full") != "cache-only":
+        from app.rag.retriever import warmup
+        warmup()
+    yield
+
+
+app = FastAPI(title="HR FAQ RAG", version="0.1.0", lifespan=lifespan)
+app.include_router(router)
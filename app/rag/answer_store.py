@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def store_key(version: str, faq_ids: Sequence[str]) -> str:
+    # 同一组资料（与顺序无关）+ 同一版索引 -> 同一个预生成答案
+    return f"{version}:{','.join(sorted(str(i) for i in faq_ids))}"
+
+
+def rows_fingerprint(docs: Sequence[Dict[str, Any]]) -> str:
+    """资料内容指纹：FAQ 的问题或答案改了，预生成答案就作废"""
+    h = hashlib.sha1()
+    for d in sorted(docs, key=lambda x: str(x.get("faq_id"))):
+        for k in ("faq_id", "question", "answer"):
+            h.update(str(d.get(k) or "").encode("utf-8"))
+            h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+class AnswerStore:
+    """
+    离线预生成的 LLM 答案，整份 json 常驻内存，查询就是一次 dict 查找。
+    由 scripts/precompute_answers.py 生成。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.answers: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.answers = json.load(f).get("answers", {})
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def get(self, version: str, docs: Sequence[Dict[str, Any]]) -> Optional[str]:
+        if not self.answers or not docs:
+            return None
+        entry = self.answers.get(store_key(version, [d.get("faq_id") for d in docs]))
+        if not entry or entry.get("fingerprint") != rows_fingerprint(docs):
+            return None
+        return entry.get("answer")
+
+    def find_reusable(self, faq_ids: Sequence[str], fingerprint: str) -> Optional[Dict[str, Any]]:
+        """索引版本变了但资料内容没变的条目可以直接沿用，不用重新调 LLM"""
+        ids = sorted(str(i) for i in faq_ids)
+        for entry in self.answers.values():
+            if entry.get("faq_ids") == ids and entry.get("fingerprint") == fingerprint:
+                return entry
+        return None
+
+    def put(self, version: str, docs: Sequence[Dict[str, Any]], answer: str, queries: List[str]) -> Dict[str, Any]:
+        entry = {
+            "faq_ids": sorted(str(d.get("faq_id")) for d in docs),
+            "fingerprint": rows_fingerprint(docs),
+            "answer": answer,
+            "queries": queries,
+            "created_at": int(time.time()),
+        }
+        self.answers[store_key(version, entry["faq_ids"])] = entry
+        return entry
+
+    def save(self, version: str) -> None:
+        # 只保留当前版本的条目
+        prefix = f"{version}:"
+        keep = {k: v for k, v in self.answers.items() if k.startswith(prefix)}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"index_version": version, "answers": keep}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        self.answers = keep
+
+
+def answer_store_path(col_name: str | None = None) -> str:
+    chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
+    default_col = os.getenv("CHROMA_COLLECTION", "hr_faq")
+    col_name = col_name or default_col
+    # ANSWER_STORE_PATH 只覆盖默认 collection，其他租户按 collection 名各存一份
+    if col_name == default_col and os.getenv("ANSWER_STORE_PATH"):
+        return os.getenv("ANSWER_STORE_PATH")
+    return os.path.join(chroma_dir, f"{col_name}.answers.json")
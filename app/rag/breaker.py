@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    上游熔断器：
+    - closed：正常放行，滑动窗口统计错误率和慢调用（>= slow_call_s）比例
+    - open：错误率或慢调用比例超阈值后打开，open_seconds 内直接快速失败
+      （看比例而不是单个最大值，偶发一次慢调用不会把所有 LLM 流量熔断）
+    - half_open：冷却结束放少量探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 50,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_s: float = 10.0,
+        slow_rate: float = 0.2,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 1,
+        latency_window: int = 200,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        # 成功调用的延迟单独保留更长的窗口，p99 才不是退化成最大值
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.fast_fails = 0
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened_count += 1
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.fast_fails += 1
+            return False
+
+    def record(self, ok: bool, latency_s: float) -> None:
+        with self._lock:
+            self._calls.append((ok, latency_s))
+            if ok:
+                self._latencies.append(latency_s)
+            if self._state == HALF_OPEN:
+                if ok and latency_s < self.slow_call_s:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                n = len(self._calls)
+                errors = sum(1 for c in self._calls if not c[0])
+                slow = sum(1 for c in self._calls if c[0] and c[1] >= self.slow_call_s)
+                if errors / n >= self.error_rate or slow / n >= self.slow_rate:
+                    self._open()
+
+    def _p99(self) -> float:
+        # 线性插值；窗口 200 时取的是第 2~3 大的样本附近，而不是最大值
+        lat = sorted(self._latencies)
+        if not lat:
+            return 0.0
+        pos = (len(lat) - 1) * 0.99
+        lo = int(pos)
+        hi = min(lo + 1, len(lat) - 1)
+        return lat[lo] + (lat[hi] - lat[lo]) * (pos - lo)
+
+    def adaptive_timeout(self, ceiling: float, floor: float = 2.0, factor: float = 1.5) -> float:
+        """超时跟着上游 p99 走：p99 * factor，限制在 [floor, ceiling] 内；样本不足时用 ceiling"""
+        with self._lock:
+            if len(self._latencies) < self.min_calls:
+                return ceiling
+            p99 = self._p99()
+        if p99 <= 0:
+            return ceiling
+        return max(floor, min(ceiling, p99 * factor))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            n = len(self._calls)
+            errors = sum(1 for c in self._calls if not c[0])
+            return {
+                "name": self.name,
+                "state": self._state,
+                "window_calls": n,
+                "error_rate": errors / n if n else 0.0,
+                "p99_s": self._p99(),
+                "fast_fails": self.fast_fails,
+                "opened_count": self.opened_count,
+            }
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Iterator, List, Optional, Set, Tuple
+
+# 中文按字计 1 token，英文/数字按词计 1 token，和 bge / DeepSeek 的分词量级接近
+_TOKEN_RE = re.compile(r"[一-鿿]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_一-鿿]")
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+_SENT_END = "。！？；!?;\n"
+_PARA_SEP = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """本地 token 估算，不依赖 tokenizer 模型"""
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+@dataclass
+class Chunk:
+    source: str
+    index: int       # 文件内第几个 chunk
+    offset: int      # 在源文件（去标签后）中的字符偏移
+    heading: str     # 所属的最近一级标题
+    text: str
+
+
+class _HTMLText(HTMLParser):
+    """只保留正文文本，块级标签处换行"""
+
+    _BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+    _SKIP = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+        if tag in {"h1", "h2", "h3", "h4", "h5", "h6"}:
+            self.parts.append("#" * int(tag[1]) + " ")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+    def drain(self) -> str:
+        s = "".join(self.parts)
+        self.parts = []
+        return s
+
+
+def _cut_after_tokens(text: str, n: int) -> int:
+    """前 n 个 token 结束处的字符下标（按 token 而不是按字符切，中英混排也不会多切 / 少切）"""
+    if n <= 0:
+        return 0
+    for i, m in enumerate(_TOKEN_RE.finditer(text)):
+        if i == n - 1:
+            return m.end()
+    return len(text)
+
+
+def truncate_tokens(text: str, n: int) -> str:
+    """保留前 n 个 token（和 estimate_tokens 同一口径）"""
+    return (text or "")[:_cut_after_tokens(text or "", n)]
+
+
+def _tail_tokens(text: str, n: int) -> str:
+    """最后 n 个 token（含中间的空白），用作相邻 chunk 的 overlap"""
+    if n <= 0:
+        return ""
+    starts = [m.start() for m in _TOKEN_RE.finditer(text)]
+    return text if len(starts) <= n else text[starts[-n]:]
+
+
+def iter_paragraphs(path: str, block_chars: int = 1 << 16, max_pending: int = 1 << 16) -> Iterator[Tuple[int, str]]:
+    """
+    增量读取文件，按空行切段落，产出 (offset, paragraph)。
+    每轮只扫描新读入的部分找空行；没有空行的长文本（单换行导出的手册）待处理部分超过 max_pending
+    就在最后一个换行 / 句末处切开，内存和扫描量都与文件大小无关。
+    """
+    is_html = path.lower().endswith((".html", ".htm"))
+    parser = _HTMLText() if is_html else None
+
+    buf = ""
+    buf_offset = 0  # buf[0] 在源文件（去标签后）中的偏移
+    scan_from = 0   # buf 里这个位置之前已经确认没有空行
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            raw = f.read(block_chars)
+            eof = not raw
+            if parser is not None:
+                if eof:
+                    parser.close()
+                else:
+                    parser.feed(raw)
+                raw = parser.drain()
+            buf += raw
+
+            start = 0
+            for m in _PARA_SEP.finditer(buf, scan_from):
+                seg = buf[start:m.start()]
+                if seg.strip():
+                    yield buf_offset + start + len(seg) - len(seg.lstrip()), seg.strip()
+                start = m.end()
+            if eof:
+                seg = buf[start:]
+                if seg.strip():
+                    yield buf_offset + start + len(seg) - len(seg.lstrip()), seg.strip()
+                break
+
+            # 最后一个段落可能被 block 截断，留到下一轮；太长就先切出一段
+            while len(buf) - start > max_pending:
+                window = buf[start:start + max_pending]
+                cut = max(window.rfind(ch) for ch in _SENT_END) + 1 or max_pending
+                seg = window[:cut]
+                if seg.strip():
+                    yield buf_offset + start + len(seg) - len(seg.lstrip()), seg.strip()
+                start += cut
+            buf_offset += start
+            buf = buf[start:]
+            # 跨 block 的空行只可能从尾部的空白开始
+            scan_from = len(buf.rstrip())
+
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """段落按句子切，单句仍超长则按 token 数硬切"""
+    pieces: List[str] = []
+    cur = ""
+    for ch in text:
+        cur += ch
+        if ch in _SENT_END:
+            pieces.append(cur)
+            cur = ""
+    if cur:
+        pieces.append(cur)
+
+    out: List[str] = []
+    for p in pieces:
+        while estimate_tokens(p) > max_tokens:
+            cut = _cut_after_tokens(p, max_tokens)
+            out.append(p[:cut])
+            p = p[cut:]
+        if p.strip():
+            out.append(p)
+    return out
+
+
+def iter_chunks(path: str, max_tokens: int = 384, overlap_tokens: int = 64) -> Iterator[Chunk]:
+    """
+    段落 -> 按 token 预算装箱的 chunk。
+    相邻 chunk 之间保留 overlap_tokens 的尾部句子，避免条款被切断后检索不到。
+    """
+    heading = ""
+    window: List[Tuple[int, str, int]] = []  # (offset, text, tokens)
+    window_tokens = 0
+    idx = 0
+
+    def flush() -> Optional[Chunk]:
+        nonlocal idx
+        if not window:
+            return None
+        c = Chunk(
+            source=path,
+            index=idx,
+            offset=window[0][0],
+            heading=heading,
+            text="\n".join(t for _, t, _ in window),
+        )
+        idx += 1
+        return c
+
+    for offset, para in iter_paragraphs(path):
+        m = _HEADING_RE.match(para.splitlines()[0])
+        if m:
+            c = flush()
+            if c:
+                yield c
+            window, window_tokens = [], 0
+            heading = m.group(1).strip()
+            para = "\n".join(para.splitlines()[1:]).strip()
+            if not para:
+                continue
+
+        for piece in _split_long(para, max_tokens):
+            n = estimate_tokens(piece)
+            if window and window_tokens + n > max_tokens:
+                c = flush()
+                if c:
+                    yield c
+                # 保留尾部作为 overlap；放不下整句时截取该句最后几个 token，保证相邻 chunk 确实有重叠
+                keep: List[Tuple[int, str, int]] = []
+                kept = 0
+                for item in reversed(window):
+                    if kept + item[2] > overlap_tokens:
+                        rest = overlap_tokens - kept
+                        if rest > 0:
+                            keep.insert(0, (item[0], _tail_tokens(item[1], rest), rest))
+                            kept += rest
+                        break
+                    keep.insert(0, item)
+                    kept += item[2]
+                window, window_tokens = keep, kept
+            window.append((offset, piece, n))
+            window_tokens += n
+
+    c = flush()
+    if c:
+        yield c
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """字符 3-gram simhash，用于近似重复检测"""
+    s = "".join(text.split())
+    grams = [s[i:i + 3] for i in range(max(1, len(s) - 2))]
+    acc = [0] * bits
+    for g in grams:
+        h = int.from_bytes(hashlib.md5(g.encode("utf-8")).digest()[:8], "big")
+        for b in range(bits):
+            acc[b] += 1 if (h >> b) & 1 else -1
+    out = 0
+    for b in range(bits):
+        if acc[b] > 0:
+            out |= 1 << b
+    return out
+
+
+class NearDupFilter:
+    """
+    近似去重：先按规范化文本精确去重，再用 simhash 汉明距离判断。
+    simhash 按 4 段 16 bit 分桶，只和同桶的候选比较。
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self._exact: Set[str] = set()
+        self._buckets: List[dict] = [{} for _ in range(4)]
+
+    def seen(self, text: str) -> bool:
+        norm = " ".join(text.split())
+        key = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        if key in self._exact:
+            return True
+
+        h = simhash(norm)
+        for i in range(4):
+            band = (h >> (16 * i)) & 0xFFFF
+            for other in self._buckets[i].get(band, ()):
+                if bin(h ^ other).count("1") <= self.max_distance:
+                    return True
+
+        self._exact.add(key)
+        for i in range(4):
+            band = (h >> (16 * i)) & 0xFFFF
+            self._buckets[i].setdefault(band, []).append(h)
+        return False
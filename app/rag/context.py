@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+from app.rag.chunker import estimate_tokens, truncate_tokens
+
+
+@dataclass
+class PackedContext:
+    docs: List[Dict[str, Any]] = field(default_factory=list)
+    indices: List[int] = field(default_factory=list)  # docs 在原 hits 中的下标
+    tokens: int = 0
+    dropped_low_score: int = 0
+    dropped_dup: int = 0
+    dropped_budget: int = 0
+
+
+def _bigrams(text: str) -> set:
+    s = "".join((text or "").split())
+    return {s[i:i + 2] for i in range(len(s) - 1)} or {s}
+
+
+def _overlap(a: set, b: set) -> float:
+    # 用包含度而不是 Jaccard：“材料要求”的答案往往是“申请流程”答案再加一句，应判为重复
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+# 每条资料在 prompt 里的固定开销（编号、“问：/答：”等）
+_DOC_OVERHEAD = 12
+
+
+def _doc_tokens(item: Dict[str, Any]) -> int:
+    return estimate_tokens(item.get("question", "")) + estimate_tokens(item.get("answer", "")) + _DOC_OVERHEAD
+
+
+def _truncate_doc(item: Dict[str, Any], budget_tokens: int) -> Dict[str, Any]:
+    """按 token 截断到预算内：答案优先，问题很长时最多占一半"""
+    avail = max(0, budget_tokens - _DOC_OVERHEAD)
+    qn = estimate_tokens(item.get("question", ""))
+    an = estimate_tokens(item.get("answer", ""))
+    q_keep = min(qn, max(avail // 2, avail - an))
+    return {
+        **item,
+        "question": truncate_tokens(item.get("question") or "", q_keep),
+        "answer": truncate_tokens(item.get("answer") or "", avail - q_keep),
+    }
+
+
+def build_context(
+    hits: Sequence[Dict[str, Any]],
+    max_docs: int | None = None,
+    budget_tokens: int | None = None,
+    min_rel_score: float | None = None,
+    dup_threshold: float | None = None,
+) -> PackedContext:
+    """
+    从检索结果里挑出送给 LLM 的资料：
+    1. 分数低于 best * min_rel_score 的丢掉
+    2. 答案和已选资料高度重叠的丢掉（兄弟 FAQ 答案几乎一样）
+    3. 累计 token 不超过 budget_tokens，第一条超预算时按 token 截断（答案优先）
+    """
+    max_docs = max_docs or int(os.getenv("LLM_CONTEXT_DOCS", "3"))
+    budget_tokens = budget_tokens or int(os.getenv("LLM_CONTEXT_TOKENS", "1200"))
+    if min_rel_score is None:
+        min_rel_score = float(os.getenv("LLM_CONTEXT_MIN_REL", "0.85"))
+    if dup_threshold is None:
+        dup_threshold = float(os.getenv("LLM_CONTEXT_DUP", "0.9"))
+
+    packed = PackedContext()
+    if not hits:
+        return packed
+
+    best = float(hits[0].get("score", 0.0))
+    chosen_grams: List[set] = []
+
+    for i, h in enumerate(hits):
+        if len(packed.docs) >= max_docs:
+            break
+        if best > 0 and float(h.get("score", 0.0)) < best * min_rel_score:
+            packed.dropped_low_score += 1
+            continue
+
+        grams = _bigrams(h.get("answer", ""))
+        if any(_overlap(grams, g) >= dup_threshold for g in chosen_grams):
+            packed.dropped_dup += 1
+            continue
+
+        n = _doc_tokens(h)
+        if packed.tokens + n > budget_tokens:
+            if packed.docs:
+                packed.dropped_budget += 1
+                continue
+            # 至少保留 top1，问题和答案按 token 截断到预算内
+            h = _truncate_doc(h, budget_tokens)
+            n = _doc_tokens(h)
+
+        packed.docs.append(h)
+        packed.indices.append(i)
+        packed.tokens += n
+        chosen_grams.append(grams)
+
+    return packed
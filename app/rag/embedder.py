@@ -2,27 +2,74 @@ from __future__ import annotations
 
 import os
 from functools import lru_cache
-from typing import List, Optional
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 
 @lru_cache(maxsize=1)
-def get_embedder(model_name: Optional[str] = None) -> SentenceTransformer:
+def get_embedder(model_name: Optional[str] = None) -> "SentenceTransformer":
+    # sentence_transformers 会连带加载 torch（秒级），推迟到第一次 embedding / warmup
+    from sentence_transformers import SentenceTransformer
+
     # 第一次运行会自动下载模型到本地缓存 (~100MB)
     name = model_name or os.getenv("EMBED_MODEL", "BAAI/bge-small-zh-v1.5")
     return SentenceTransformer(name)
 
 
-def embed_texts(texts: List[str], model_name: Optional[str] = None, batch_size: int = 32) -> List[List[float]]:
+def encode(
+    texts: List[str],
+    model_name: Optional[str] = None,
+    batch_size: int = 32,
+    show_progress_bar: bool = True,
+) -> np.ndarray:
+    """返回 float32 的 (n, dim) 矩阵，不经过 Python list"""
     model = get_embedder(model_name)
     vecs = model.encode(
         texts,
         batch_size=batch_size,
         convert_to_numpy=True,
         normalize_embeddings=True,  # 归一化，这对 Cosine 相似度至关重要
-        show_progress_bar=True,
+        show_progress_bar=show_progress_bar,
     )
+    return vecs.astype(np.float32, copy=False)
+
+
+def embed_texts(texts: List[str], model_name: Optional[str] = None, batch_size: int = 32) -> List[List[float]]:
     # Chroma 需要 list 格式
-    return vecs.astype(np.float32).tolist()
\ No newline at end of file
+    return encode(texts, model_name=model_name, batch_size=batch_size).tolist()
+
+
+def iter_embed_parallel(
+    texts: List[str],
+    workers: int,
+    model_name: Optional[str] = None,
+    batch_size: int = 32,
+    window: int = 4096,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    多进程 embedding，按原顺序分窗口产出 (start, vecs)，调用方可以边算边写库。
+    每个窗口内先按长度排序再分给 worker，同一个 batch 长度接近，padding 浪费少；
+    算完再按原下标还原顺序。
+    """
+    model = get_embedder(model_name)
+    pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+    try:
+        for start in range(0, len(texts), window):
+            part = texts[start:start + window]
+            order = np.argsort([len(t) for t in part], kind="stable")
+            vecs = model.encode_multi_process(
+                [part[i] for i in order],
+                pool,
+                batch_size=batch_size,
+                chunk_size=max(batch_size, len(part) // (workers * 4) or 1),
+                normalize_embeddings=True,
+            )
+            out = np.empty_like(vecs, dtype=np.float32)
+            out[order] = vecs
+            yield start, out
+    finally:
+        model.stop_multi_process_pool(pool)
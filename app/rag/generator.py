@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import os
+import random
 import time
-import requests  
-from typing import List, Dict, Any
-from dotenv import load_dotenv
+from typing import Any, Callable, Dict, List, Optional
 
-load_dotenv()
+from app.rag.breaker import CircuitBreaker
+from app.rag.chunker import estimate_tokens
+
+# .env 由 app.main / 各脚本入口统一加载，这里不在 import 时读文件
 
 class LLMGenerator:
     def __init__(self):
@@ -15,12 +17,35 @@ class LLMGenerator:
         self.base_url = base.rstrip("/")
         self.model = os.getenv("LLM_MODEL", "deepseek-ai/DeepSeek-V3")
         self.timeout = int(os.getenv("LLM_TIMEOUT", "20"))
+        self.timeout_floor = float(os.getenv("LLM_TIMEOUT_FLOOR", "3"))
+        self.retries = int(os.getenv("LLM_RETRIES", "1"))
+        self.backoff = float(os.getenv("LLM_BACKOFF", "0.3"))
+        self.breaker = CircuitBreaker(
+            "llm",
+            error_rate=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_s=float(os.getenv("LLM_BREAKER_SLOW_CALL_S", "10")),
+            slow_rate=float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.2")),
+            open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "15")),
+        )
 
-    def generate(self, query: str, context: List[Dict[str, Any]]) -> str:
+    def generate(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        strict: bool = False,
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None,
+        fallback: bool = True,
+    ) -> Optional[str]:
+        # context 应该已经过 build_context 去重 + 控长，这里只负责拼 prompt
+        # strict=True 时出错直接抛异常而不是降级（离线预生成不能把兜底文案存进去）
+        # fallback=False 时熔断 / 调用失败返回 None，由调用方走降级分支（不能当成 LLM 答案缓存）
+        # on_usage 在调用成功后拿到 token 用量，用于按调用方记账
         # --- Mock / 降级检查 ---
         # 如果 Key 是空的，或者包含 mock 字样，直接跳过网络请求
         if not self.api_key or "mock" in self.api_key.lower():
-            return self._mock_generate(context, error_msg="未配置API Key")
+            if strict:
+                raise RuntimeError("LLM_API_KEY not configured")
+            return self._mock_generate(context, error_msg="未配置API Key") if fallback else None
 
         # --- 构建 Prompt ---
         docs_str = ""
@@ -39,6 +64,7 @@ class LLMGenerator:
         )
         
         user_prompt = f"【参考资料】：\n{docs_str}\n【用户问题】：{query}"
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
 
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -56,31 +82,80 @@ class LLMGenerator:
             "stream": False
         }
 
-        try:
+        import requests  # 只有真正调用 LLM 才需要，cache-only / 健康检查进程不加载
+
+        # --- 熔断检查 ---
+        # 上游已经不稳定时直接降级，不占着线程等超时
+        if not self.breaker.allow():
+            if strict:
+                raise RuntimeError("LLM circuit breaker open")
+            return self._mock_generate(context, error_msg="AI 服务繁忙") if fallback else None
+
+        # 超时跟随上游 p99 自适应，LLM_TIMEOUT 只是上限；所有重试加起来也不超过 LLM_TIMEOUT
+        timeout = self.breaker.adaptive_timeout(self.timeout, floor=self.timeout_floor)
+        deadline = time.monotonic() + self.timeout
+        error_msg = "网络请求超时"
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                # full jitter 退避，避免所有 worker 同一时刻重试把上游再打挂
+                time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+                if not self.breaker.allow():
+                    break
+
+            attempt_timeout = min(timeout, deadline - time.monotonic())
+            if attempt_timeout <= 0:
+                break
             t0 = time.time()
-            # 这里直接请求 /chat/completions 接口
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                json=payload,
-                headers=headers,
-                timeout=self.timeout
-            )
-            elapsed = time.time() - t0
-            
-            # 检查 HTTP 状态码
-            if response.status_code != 200:
-                print(f"[LLM Error] HTTP {response.status_code}: {response.text}")
-                return self._mock_generate(context, error_msg=f"服务报错 {response.status_code}")
-
-            res_json = response.json()
-            content = res_json["choices"][0]["message"]["content"]
-            
-            print(f"[LLM Call] Model: {self.model}, Cost: {elapsed:.2f}s")
-            return content
-
-        except Exception as e:
-            print(f"[LLM Exception] {e}")
-            return self._mock_generate(context, error_msg="网络请求超时")
+            try:
+                # 这里直接请求 /chat/completions 接口
+                response = requests.post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=headers,
+                    timeout=attempt_timeout
+                )
+                elapsed = time.time() - t0
+
+                # 检查 HTTP 状态码
+                if response.status_code != 200:
+                    print(f"[LLM Error] HTTP {response.status_code}: {response.text} (prompt≈{prompt_tokens} tok, {elapsed:.2f}s)")
+                    self.breaker.record(False, elapsed)
+                    error_msg = f"服务报错 {response.status_code}"
+                    # 4xx（429 除外）重试也没用
+                    if response.status_code != 429 and response.status_code < 500:
+                        break
+                    continue
+
+                res_json = response.json()
+                content = res_json["choices"][0]["message"]["content"]
+                usage = res_json.get("usage") or {}
+                self.breaker.record(True, elapsed)
+
+                print(
+                    f"[LLM Call] Model: {self.model}, Cost: {elapsed:.2f}s, Docs: {len(context)}, "
+                    f"Prompt: ≈{prompt_tokens} tok (usage: {usage.get('prompt_tokens', '-')}), "
+                    f"Completion: {usage.get('completion_tokens', '-')} tok, Timeout: {timeout:.1f}s"
+                )
+                if on_usage:
+                    # 上游没返回 usage 时用本地估算兜底
+                    on_usage({
+                        "prompt_tokens": int(usage.get("prompt_tokens") or prompt_tokens),
+                        "completion_tokens": int(usage.get("completion_tokens") or estimate_tokens(content)),
+                    })
+                return content
+
+            except Exception as e:
+                self.breaker.record(False, time.time() - t0)
+                print(f"[LLM Exception] {e} (attempt {attempt + 1}, timeout {attempt_timeout:.1f}s)")
+                error_msg = "网络请求超时"
+                # 上游挂住时重试只会再占一整个超时，直接降级
+                if isinstance(e, requests.exceptions.Timeout):
+                    break
+
+        if strict:
+            raise RuntimeError(f"LLM call failed: {error_msg}")
+        return self._mock_generate(context, error_msg=error_msg) if fallback else None
 
     def _mock_generate(self, context: List[Dict[str, Any]], error_msg: str = "") -> str:
         """兜底生成"""
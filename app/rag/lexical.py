@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.rag.results import FaqTable
+
+_NON_WORD = re.compile(r"[\s\W_]+")
+
+
+def _grams(text: str) -> Counter:
+    # 中文没有分词也能用：字符 bigram，单字查询退化成 unigram
+    s = _NON_WORD.sub("", (text or "").lower())
+    if len(s) < 2:
+        return Counter([s]) if s else Counter()
+    return Counter(s[i:i + 2] for i in range(len(s) - 1))
+
+
+class LexicalIndex:
+    """
+    字符 bigram 的 TF-IDF 倒排索引，分数是 cosine 相似度（0~1）。
+    不依赖 embedding 模型，INDEX_BACKEND=lexical 时进程不会加载 torch。
+    """
+
+    def __init__(self, table: FaqTable):
+        # 和 build_index 一样：索引内容 = 标题 + 问题
+        docs = [_grams(f"{t or ''}\n{q or ''}") for t, q in zip(table.title, table.question)]
+        n = len(docs)
+        df: Counter = Counter()
+        for d in docs:
+            df.update(d.keys())
+        self.idf = {g: math.log((n + 1) / (c + 1)) + 1.0 for g, c in df.items()}
+
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for row, d in enumerate(docs):
+            weights = {g: (1 + math.log(tf)) * self.idf[g] for g, tf in d.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for g, w in weights.items():
+                self.postings[g].append((row, w / norm))
+        self.size = n
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        q = _grams(query)
+        weights = {g: (1 + math.log(tf)) * self.idf[g] for g, tf in q.items() if g in self.idf}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        acc: Dict[int, float] = defaultdict(float)
+        for g, w in weights.items():
+            for row, dw in self.postings[g]:
+                acc[row] += w / norm * dw
+
+        top = sorted(acc.items(), key=lambda kv: -kv[1])[:k]
+        rows = np.fromiter((r for r, _ in top), dtype=np.int64, count=len(top))
+        scores = np.fromiter((s for _, s in top), dtype=np.float32, count=len(top))
+        return rows, scores
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DTYPES = ("fp32", "fp16", "int8")
+
+
+def export_paths(chroma_dir: str, col_name: str) -> Tuple[str, str]:
+    base = os.path.join(chroma_dir, col_name)
+    return base + ".vectors.npy", base + ".rows.json"
+
+
+def export_collection(col, chroma_dir: str, col_name: str, page: int = 5000) -> int:
+    """
+    把 Chroma 里的向量 + metadata 导出成 npy/json，供 NumPy 后端加载。
+    float32 原始向量单独存一份，量化索引用 mmap 读它做精排。
+    """
+    vecs: List[np.ndarray] = []
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        res = col.get(include=["embeddings", "metadatas"], limit=page, offset=offset)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        vecs.append(np.asarray(res["embeddings"], dtype=np.float32))
+        rows.extend(res["metadatas"])
+        offset += len(ids)
+
+    vec_path, rows_path = export_paths(chroma_dir, col_name)
+    mat = np.concatenate(vecs) if vecs else np.zeros((0, 0), dtype=np.float32)
+    np.save(vec_path, mat)
+    with open(rows_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+    return len(rows)
+
+
+class QuantizedIndex:
+    """
+    暴力内积检索（向量已归一化，内积即 cosine）：
+    - fp16：直接半精度存储，内存减半
+    - int8：按维度对称量化 x ≈ q * scale[d]，内存 1/4
+    打分时分块转成 float32 做矩阵乘，临时内存固定为 block * dim。
+    rescore > 0 时先取 topk * rescore 个候选，再用 mmap 的 float32 原向量精排。
+    """
+
+    def __init__(self, vectors: np.ndarray, dtype: str = "int8", exact: Optional[np.ndarray] = None, block: int = 16384):
+        if dtype not in DTYPES:
+            raise ValueError(f"unknown dtype: {dtype}")
+        self.dtype = dtype
+        self.block = block
+        self.exact = exact
+        self.scale: Optional[np.ndarray] = None
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dtype == "fp32":
+            self.data = np.array(vectors, dtype=np.float32)  # 从 mmap 拷进内存
+        elif dtype == "fp16":
+            self.data = vectors.astype(np.float16)
+        else:
+            absmax = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1], np.float32)
+            self.scale = np.where(absmax > 0, absmax / 127.0, 1.0).astype(np.float32)
+            self.data = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def scores(self, q: np.ndarray) -> np.ndarray:
+        q = np.asarray(q, dtype=np.float32).reshape(-1)
+        if self.scale is not None:
+            # sum_d q_int[d] * scale[d] * q[d]：scale 并进 query，矩阵只需要转类型
+            q = q * self.scale
+        out = np.empty(len(self.data), dtype=np.float32)
+        for s in range(0, len(self.data), self.block):
+            out[s:s + self.block] = self.data[s:s + self.block].astype(np.float32) @ q
+        return out
+
+    def search(self, q: np.ndarray, k: int, rescore: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (行号, 相似度)，按相似度降序"""
+        n = len(self.data)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        k = min(k, n)
+        s = self.scores(q)
+
+        cand_n = min(n, k * rescore) if rescore > 0 and self.exact is not None else k
+        cand = np.argpartition(-s, cand_n - 1)[:cand_n]
+        if cand_n > k:
+            # 只从磁盘读候选行，float32 精确重打分
+            cand = np.sort(cand)
+            exact = self.exact[cand] @ np.asarray(q, dtype=np.float32).reshape(-1)
+            order = np.argsort(-exact)[:k]
+            return cand[order], exact[order].astype(np.float32)
+        order = np.argsort(-s[cand])
+        return cand[order], s[cand[order]]
+
+
+def load_index(chroma_dir: str, col_name: str, dtype: str) -> Tuple[QuantizedIndex, List[Dict[str, Any]]]:
+    vec_path, rows_path = export_paths(chroma_dir, col_name)
+    exact = np.load(vec_path, mmap_mode="r")
+    with open(rows_path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    return QuantizedIndex(exact, dtype=dtype, exact=exact), rows
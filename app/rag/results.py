@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+FIELDS = ("faq_id", "title", "question", "answer", "tags")
+
+
+class FaqTable:
+    """
+    FAQ 行的只读列式表，租户索引加载时建一次（索引重建后随租户重新加载）。
+    检索结果只保存行号，答案等长文本始终引用这里的同一份字符串，不再逐请求拷贝。
+    """
+
+    __slots__ = FIELDS + ("_pos",)
+
+    def __init__(self, rows: Sequence[Mapping[str, Any]]):
+        for f in FIELDS:
+            object.__setattr__(self, f, tuple(r.get(f) or ("" if f == "tags" else None) for r in rows))
+        object.__setattr__(self, "_pos", {fid: i for i, fid in enumerate(self.faq_id)})
+
+    def __setattr__(self, key, value):
+        raise AttributeError("FaqTable is immutable")
+
+    def __len__(self) -> int:
+        return len(self.faq_id)
+
+    def positions(self, ids: Sequence[str]) -> np.ndarray:
+        """faq_id -> 行号；表里没有的 id（建表后新增的）记为 -1"""
+        return np.fromiter((self._pos.get(i, -1) for i in ids), dtype=np.int64, count=len(ids))
+
+
+class Hit(Mapping):
+    """单条命中：表的一行 + 分数的只读视图，兼容原来 dict 的 h.get("answer") 用法"""
+
+    __slots__ = ("_table", "_row", "_score")
+
+    def __init__(self, table: FaqTable, row: int, score: float):
+        self._table = table
+        self._row = row
+        self._score = score
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "score":
+            return self._score
+        if key in FIELDS:
+            return getattr(self._table, key)[self._row]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        yield "score"
+
+    def __len__(self) -> int:
+        return len(FIELDS) + 1
+
+    def __repr__(self) -> str:
+        return f"Hit({self['faq_id']!r}, score={self._score:.4f})"
+
+
+class RetrievalResult:
+    """一次检索的结果：行号和分数都是 NumPy 数组，按需再取成 Hit"""
+
+    __slots__ = ("table", "rows", "scores")
+
+    def __init__(self, table: FaqTable, rows: np.ndarray, scores: np.ndarray):
+        keep = rows >= 0
+        if not keep.all():
+            # 索引里有、表里没有的 id：租户索引重建后还没重新加载，正常情况下不会出现
+            print(f"[WARN] {int((~keep).sum())}/{len(rows)} hits missing from FaqTable, index rebuilt since load?")
+            # top1 缺失时当作未命中，不能把 top2 顶上来按 top1 的分数走直通
+            rows, scores = (rows[keep], scores[keep]) if keep[0] else (rows[:0], scores[:0])
+        self.table = table
+        self.rows = rows
+        self.scores = scores.astype(np.float32, copy=False)
+
+    @classmethod
+    def empty(cls, table: FaqTable) -> "RetrievalResult":
+        return cls(table, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, i: int) -> Hit:
+        return Hit(self.table, int(self.rows[i]), float(self.scores[i]))
+
+    def __iter__(self) -> Iterator[Hit]:
+        # tolist 一次性转成 Python 标量，比逐个 int(np.int64) 快
+        for r, s in zip(self.rows.tolist(), self.scores.tolist()):
+            yield Hit(self.table, r, s)
+
+    @property
+    def best_score(self) -> float:
+        return float(self.scores[0]) if len(self.scores) else 0.0
+
+    @property
+    def ids(self) -> List[str]:
+        ids = self.table.faq_id
+        return [ids[r] for r in self.rows]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(h) for h in self]
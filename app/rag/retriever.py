@@ -1,49 +1,198 @@
 from __future__ import annotations
 
+import csv
+import json
 import os
-from typing import Any, Dict, List
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
-from app.rag.embedder import embed_texts
-from app.rag.vectorstore import get_collection
+import numpy as np
+
+from app.rag.answer_store import AnswerStore, answer_store_path
+from app.rag.embedder import encode
+from app.rag.lexical import LexicalIndex
+from app.rag.quantized import QuantizedIndex, export_paths, load_index
+from app.rag.results import FIELDS, FaqTable, Hit, RetrievalResult
+from app.rag.tenants import DEFAULT_TENANT, TenantRegistry, TenantSpec, load_tenants
+from app.rag.vectorstore import get_collection, get_index_version, refresh_index_version
 
 # 标准化查询，去除首尾空格和中间空格
 def normalize_query(q: str) -> str:
     return " ".join((q or "").strip().split())
 
 
-def retrieve(query: str, topk: int | None = None) -> List[Dict[str, Any]]:
+def _backend() -> str:
+    return os.getenv("INDEX_BACKEND", "chroma")
+
+
+def _load_rows_without_chroma(spec: TenantSpec) -> List[Dict[str, Any]]:
+    # 优先用 build_index 导出的行（含长文档 chunk），没有就直接读 FAQ csv
+    chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
+    _, rows_path = export_paths(chroma_dir, spec.collection)
+    if os.path.exists(rows_path):
+        with open(rows_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    with open(spec.faq_csv or os.getenv("FAQ_CSV", "datasets/faq.csv"), "r", encoding="utf-8") as f:
+        return [{k: (v or "").strip() for k, v in r.items()} for r in csv.DictReader(f)]
+
+
+def _load_chroma_rows(col_name: str) -> List[Dict[str, Any]]:
+    # Chroma 后端：加载时一次性拉全部 metadata，之后 query 只要 ids + distances
+    col = get_collection(col_name)
+    rows = []
+    offset = 0
+    while True:
+        res = col.get(include=["metadatas"], limit=5000, offset=offset)
+        metas = res.get("metadatas") or []
+        if not metas:
+            break
+        rows.extend(metas)
+        offset += len(metas)
+    return rows
+
+
+class TenantIndex:
+    """
+    一个租户常驻内存的检索数据：FaqTable + 后端索引 + 预生成答案。
+    nbytes 是粗略估算，TenantRegistry 按它做内存预算内的 LRU 淘汰。
+    """
+
+    def __init__(self, spec: TenantSpec):
+        self.spec = spec
+        # 每次（重新）加载都重读版本，索引重建后淘汰再加载的租户不会沿用旧版本
+        self.version = refresh_index_version(spec.collection)
+        self.index: Optional[QuantizedIndex] = None
+        self.lexical: Optional[LexicalIndex] = None
+
+        if _backend() == "lexical":
+            # INDEX_BACKEND=lexical：纯字面检索，不加载 embedding 模型
+            self.table = FaqTable(_load_rows_without_chroma(spec))
+            self.lexical = LexicalIndex(self.table)
+        elif _backend() != "chroma":
+            # NumPy 后端：导出文件里的行顺序就是矩阵行号
+            self.index, rows = load_index(os.getenv("CHROMA_DIR", "./vectorstore"), spec.collection, _backend())
+            self.table = FaqTable(rows)
+        else:
+            self.table = FaqTable(_load_chroma_rows(spec.collection))
+
+        # 高频问题的答案离线预生成过，同一组资料直接取，不再调 LLM
+        self.answers = AnswerStore(answer_store_path(spec.collection))
+
+        nbytes = sum(sys.getsizeof(v) for f in FIELDS for v in getattr(self.table, f) if v)
+        if self.index is not None:
+            nbytes += self.index.nbytes
+        if self.lexical is not None:
+            # 每个倒排项约 (tuple + int + float) ~ 100 字节
+            nbytes += 100 * sum(len(p) for p in self.lexical.postings.values())
+        if os.path.exists(self.answers.path):
+            nbytes += os.path.getsize(self.answers.path)
+        self.nbytes = nbytes
+
+    def stale(self) -> bool:
+        """索引重建过（meta 文件里的版本变了）：FaqTable 里可能缺新增的 faq_id，要重新加载"""
+        return get_index_version(self.spec.collection) != self.version
+
+
+@lru_cache(maxsize=1)
+def get_registry() -> TenantRegistry:
+    # 所有租户共用 get_embedder() 这一份模型，只有索引按租户加载 / 淘汰
+    budget = int(float(os.getenv("TENANT_MEMORY_MB", "0")) * 1024 * 1024)
+    return TenantRegistry(load_tenants(), TenantIndex, budget_bytes=budget, is_stale=TenantIndex.stale)
+
+
+def get_tenant(tenant: str | None = None) -> TenantIndex:
+    return get_registry().get(tenant or DEFAULT_TENANT)
+
+
+def get_faq_table(tenant: str | None = None) -> FaqTable:
+    return get_tenant(tenant).table
+
+
+def search(
+    query: str, topk: int | None = None, tenant: str | None = None, index: TenantIndex | None = None
+) -> RetrievalResult:
+    """index：调用方已取到的租户索引（同一请求后面还要用它的版本 / 预生成答案），不再按名字取一次"""
+    ti = index or get_tenant(tenant)
+    table = ti.table
     q = normalize_query(query)
     if not q:
-        return [] 
+        return RetrievalResult.empty(table)
 
     k = topk or int(os.getenv("TOPK", "5"))
-    col = get_collection()
 
-    # 问题转成向量
-    q_emb = embed_texts([q], batch_size=1)[0]
-    # 搜索topk
-    res = col.query(
-        query_embeddings=[q_emb],
+    if ti.lexical is not None:
+        rows, scores = ti.lexical.search(q, k)
+        return RetrievalResult(table, rows, scores)
+
+    # 问题转成向量（直接用 NumPy，不转 list）
+    q_vec = encode([q], batch_size=1, show_progress_bar=False)[0]
+
+    # INDEX_BACKEND=fp16/int8/fp32：用导出的 NumPy 矩阵检索，不走 Chroma
+    if ti.index is not None:
+        rows, scores = ti.index.search(q_vec, k, rescore=int(os.getenv("INDEX_RESCORE", "4")))
+        return RetrievalResult(table, rows, scores)
+
+    # 搜索topk；metadata 已在内存表里，不再让 Chroma 反序列化
+    res = get_collection(ti.spec.collection).query(
+        query_embeddings=q_vec[None, :],
         n_results=k,
-        include=["distances", "metadatas"],
+        include=["distances"],
     )
-
-    out: List[Dict[str, Any]] = []
     # Chroma 返回的结构是 List[List]，需要解包
-    metas = res.get("metadatas", [[]])[0]
-    dists = res.get("distances", [[]])[0]
-
-    for meta, dist in zip(metas, dists):
-        sim = 1.0 - float(dist)  # 存cosine 需要相似度
-        out.append(
-            {
-                "faq_id": meta.get("faq_id"),
-                "title": meta.get("title"),
-                "question": meta.get("question"),
-                "answer": meta.get("answer"),
-                "tags": meta.get("tags", ""),
-                "score": sim,
-            }
-        )
+    ids = res.get("ids", [[]])[0]
+    dists = np.asarray(res.get("distances", [[]])[0], dtype=np.float32)
+    # 存cosine 需要相似度
+    return RetrievalResult(table, table.positions(ids), 1.0 - dists)
+
+
+def search_many(
+    queries: List[str], topk: int | None = None, batch_size: int = 64, tenant: str | None = None
+) -> List[RetrievalResult]:
+    """批量检索（缓存预热 / 离线脚本用）：一次 encode 全部 query，Chroma 按块批量 query"""
+    ti = get_tenant(tenant)
+    table = ti.table
+    qs = [normalize_query(q) for q in queries]
+    k = topk or int(os.getenv("TOPK", "5"))
+    out = [RetrievalResult.empty(table)] * len(qs)
+    todo = [i for i, q in enumerate(qs) if q]
+    if not todo:
+        return out
+
+    if ti.lexical is not None:
+        for i in todo:
+            out[i] = RetrievalResult(table, *ti.lexical.search(qs[i], k))
+        return out
+
+    vecs = encode([qs[i] for i in todo], batch_size=batch_size, show_progress_bar=False)
 
+    if ti.index is not None:
+        rescore = int(os.getenv("INDEX_RESCORE", "4"))
+        for i, v in zip(todo, vecs):
+            out[i] = RetrievalResult(table, *ti.index.search(v, k, rescore=rescore))
+        return out
+
+    col = get_collection(ti.spec.collection)
+    for start in range(0, len(todo), batch_size):
+        res = col.query(
+            query_embeddings=vecs[start:start + batch_size],
+            n_results=k,
+            include=["distances"],
+        )
+        for i, ids, dists in zip(todo[start:start + batch_size], res["ids"], res["distances"]):
+            out[i] = RetrievalResult(table, table.positions(ids), 1.0 - np.asarray(dists, dtype=np.float32))
     return out
+
+
+def retrieve(query: str, topk: int | None = None, tenant: str | None = None) -> List[Hit]:
+    """兼容旧调用：返回 Hit 列表，支持 h.get("faq_id") 等 dict 用法"""
+    return list(search(query, topk=topk, tenant=tenant))
+
+
+def warmup() -> None:
+    """启动阶段预加载索引和模型，避免第一个请求承担冷启动（秒级）"""
+    ti = get_tenant()
+    if ti.lexical is not None:
+        return
+    # 模型是所有租户共用的，预热默认租户即可；其他租户首次访问时再加载索引
+    search("年假怎么申请", topk=1)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_TENANT = "default"
+
+
+@dataclass(frozen=True)
+class TenantSpec:
+    """一个租户（子公司）对应一个 collection；faq_csv 只在 lexical 后端且没有导出文件时用"""
+
+    name: str
+    collection: str
+    faq_csv: Optional[str] = None
+
+
+def load_tenants(path: str | None = None) -> Dict[str, TenantSpec]:
+    """
+    读取 config/tenants.json：{"sub_a": {"collection": "hr_faq_sub_a"}, ...}（值也可以直接写 collection 名）。
+    没有配置文件时只有 default 一个租户，即 CHROMA_COLLECTION / FAQ_CSV。
+    """
+    specs = {
+        DEFAULT_TENANT: TenantSpec(
+            DEFAULT_TENANT,
+            os.getenv("CHROMA_COLLECTION", "hr_faq"),
+            os.getenv("FAQ_CSV", "datasets/faq.csv"),
+        )
+    }
+    path = path or os.getenv("TENANTS_CONFIG", "config/tenants.json")
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for name, v in data.items():
+            if isinstance(v, str):
+                v = {"collection": v}
+            specs[name] = TenantSpec(name, v["collection"], v.get("faq_csv"))
+    return specs
+
+
+class TenantRegistry:
+    """
+    按需加载各租户的索引，所有租户共用同一个 embedding 模型（embedder 本身是进程级单例）。
+    已加载索引的估算内存超过 budget_bytes 时，按 LRU 淘汰最久没被访问的租户；
+    is_stale 判定已加载的索引过期（重建过）时，下一次访问重新加载。
+    正在处理中的请求仍持有旧对象的引用，不受淘汰 / 重新加载影响。
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, TenantSpec],
+        loader: Callable[[TenantSpec], Any],
+        budget_bytes: int = 0,
+        is_stale: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.specs = specs
+        self.budget_bytes = budget_bytes
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+        self._loader = loader
+        self._is_stale = is_stale or (lambda entry: False)
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def get(self, name: str) -> Any:
+        spec = self.specs.get(name)
+        if spec is None:
+            raise KeyError(f"unknown tenant: {name}")
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None and not self._is_stale(entry):
+                self._loaded.move_to_end(name)
+                return entry
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        # 同一租户并发的首个请求只加载一次，其他租户不受影响；重新加载期间其他请求等新索引
+        with load_lock:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is not None and not self._is_stale(entry):
+                    self._loaded.move_to_end(name)
+                    return entry
+            reload = entry is not None
+            entry = self._loader(spec)
+            with self._lock:
+                self._loaded[name] = entry
+                self._loaded.move_to_end(name)
+                self.loads += 1
+                self.reloads += int(reload)
+                self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        # 刚加载的在队尾，至少保留它一个
+        if not self.budget_bytes:
+            return
+        while len(self._loaded) > 1 and self._used() > self.budget_bytes:
+            self._loaded.popitem(last=False)
+            self.evictions += 1
+
+    def _used(self) -> int:
+        return sum(getattr(e, "nbytes", 0) for e in self._loaded.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {name: round(getattr(e, "nbytes", 0) / 1024 / 1024, 2) for name, e in self._loaded.items()}
+        return {
+            "configured": len(self.specs),
+            "loaded_mb": loaded,
+            "budget_mb": round(self.budget_bytes / 1024 / 1024, 2),
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+        }
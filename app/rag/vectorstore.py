@@ -1,15 +1,104 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import time
 from functools import lru_cache
-
-import chromadb
+from typing import Dict, Iterable, List, Tuple
 
 # 变成单例模式，确保只初始化一次链接，第二次调用只会返回存好的对象
 @lru_cache(maxsize=1)
-def get_collection():
+def get_client():
+    import chromadb  # 较重，第一次真正用到向量库时才加载
+    from chromadb.config import Settings
+
     chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
-    col_name = os.getenv("CHROMA_COLLECTION", "hr_faq")
-    client = chromadb.PersistentClient(path=chroma_dir)
+    # 多租户：各 collection 的 HNSW 段也按 LRU + 内存上限换出，和 TenantRegistry 用同一个预算
+    budget = int(float(os.getenv("TENANT_MEMORY_MB", "0")) * 1024 * 1024)
+    settings = Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=budget) if budget else Settings()
+    return chromadb.PersistentClient(path=chroma_dir, settings=settings)
+
+
+# 所有租户共用一个 client；collection 句柄很轻，按名字缓存
+@lru_cache(maxsize=None)
+def get_collection(col_name: str | None = None):
+    col_name = col_name or os.getenv("CHROMA_COLLECTION", "hr_faq")
     # cosine space：distance = 1 - cos_sim
-    return client.get_or_create_collection(name=col_name, metadata={"hnsw:space": "cosine"})
+    return get_client().get_or_create_collection(name=col_name, metadata={"hnsw:space": "cosine"})
+
+
+def index_meta_path(chroma_dir: str, col_name: str) -> str:
+    return os.path.join(chroma_dir, f"{col_name}.meta.json")
+
+
+def collection_parts(col, page: int = 5000) -> List[str]:
+    """
+    collection 全部内容的摘要：每行 id + 完整 metadata（含答案、标签）+ 索引文本，按 id 排序。
+    FAQ 和长文档 chunk 一起算，只改答案也会换版本，不管最后跑的是哪个入库脚本。
+    """
+    parts = []
+    offset = 0
+    while True:
+        res = col.get(include=["metadatas", "documents"], limit=page, offset=offset)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        for i, meta, doc in zip(ids, res["metadatas"], res["documents"]):
+            row = json.dumps({"id": i, "meta": meta, "doc": doc}, ensure_ascii=False, sort_keys=True)
+            parts.append(f"{i}\t{hashlib.sha1(row.encode('utf-8')).hexdigest()}")
+        offset += len(ids)
+    return sorted(parts)
+
+
+def write_index_meta(chroma_dir: str, col_name: str, parts: Iterable[str]) -> str:
+    """
+    建索引后写入版本号：由模型名 + 入库内容算 hash，内容不变版本就不变。
+    预生成答案、缓存命名空间都挂在这个版本下。
+    """
+    h = hashlib.sha1(os.getenv("EMBED_MODEL", "BAAI/bge-small-zh-v1.5").encode("utf-8"))
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    version = h.hexdigest()[:12]
+
+    os.makedirs(chroma_dir, exist_ok=True)
+    with open(index_meta_path(chroma_dir, col_name), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "built_at": int(time.time())}, f)
+    return version
+
+
+# collection -> (meta 文件 mtime, 版本号)；进程内缓存，meta 文件被重写后下一次查询就切到新版本
+_versions: Dict[str, Tuple[int, str]] = {}
+
+
+def _meta_mtime(col_name: str) -> int:
+    try:
+        return os.stat(index_meta_path(os.getenv("CHROMA_DIR", "./vectorstore"), col_name)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def refresh_index_version(col_name: str | None = None) -> str:
+    """重新读 meta 文件（租户索引加载时调用），之后的缓存 key 跟着切到新版本"""
+    chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
+    col_name = col_name or os.getenv("CHROMA_COLLECTION", "hr_faq")
+    # 先取 mtime 再读内容：读的过程中被重写，下次比较 mtime 时还会再读一次
+    mtime = _meta_mtime(col_name)
+    try:
+        with open(index_meta_path(chroma_dir, col_name), "r", encoding="utf-8") as f:
+            version = json.load(f)["version"]
+    except Exception:
+        # 老索引没有 meta 文件
+        version = "unversioned"
+    _versions[col_name] = (mtime, version)
+    return version
+
+
+def get_index_version(col_name: str | None = None) -> str:
+    """每次只 stat 一下 meta 文件，mtime 没变就用缓存的版本号"""
+    col_name = col_name or os.getenv("CHROMA_COLLECTION", "hr_faq")
+    cached = _versions.get(col_name)
+    if cached is not None and cached[0] == _meta_mtime(col_name):
+        return cached[1]
+    return refresh_index_version(col_name)
@@ -0,0 +1,97 @@
+import os, sys, time, argparse, tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from app.api.schemas import AskResponse, Candidate
+from app.rag.results import FaqTable, RetrievalResult
+
+# 不加载模型和向量库，只比较「检索结果 -> 响应 -> JSON」这段的分配与耗时
+
+
+def legacy_path(table: FaqTable, rows: np.ndarray, scores: np.ndarray) -> bytes:
+    # 旧实现：Chroma 每次 query 都把 metadata 从 sqlite 反序列化成新的 dict/str，
+    # 这里用 encode/decode 模拟这次字符串拷贝；然后再拷一次 dict -> 校验构造 Candidate
+    hits = []
+    for r, s in zip(rows.tolist(), scores.tolist()):
+        meta = {f: getattr(table, f)[r].encode("utf-8").decode("utf-8")
+                for f in ("faq_id", "title", "question", "answer", "tags")}
+        hits.append({
+            "faq_id": meta.get("faq_id"),
+            "title": meta.get("title"),
+            "question": meta.get("question"),
+            "answer": meta.get("answer"),
+            "tags": meta.get("tags", ""),
+            "score": s,
+        })
+    candidates = [
+        Candidate(faq_id=h.get("faq_id"), title=h.get("title"), score=h.get("score", 0.0),
+                  question=h.get("question"), answer=h.get("answer"))
+        for h in hits
+    ]
+    resp = AskResponse(hit=True, mode="direct", answer=candidates[0].answer, confidence=candidates[0].score,
+                       sources=[candidates[0]], candidates=candidates)
+    return resp.model_dump_json().encode("utf-8")
+
+
+def new_path(table: FaqTable, rows: np.ndarray, scores: np.ndarray, with_answer: bool = True) -> bytes:
+    hits = RetrievalResult(table, rows, scores)
+    candidates = Candidate.from_result(hits, with_answer=with_answer)
+    best = hits[0]
+    resp = AskResponse(hit=True, mode="direct", answer=best["answer"], confidence=hits.best_score,
+                       sources=[Candidate.from_hit(best)], candidates=candidates)
+    return resp.model_dump_json().encode("utf-8")
+
+
+def measure(name, fn, cases):
+    # 先热身，避免首次调用的懒初始化算进去
+    for rows, scores in cases[:50]:
+        fn(rows, scores)
+
+    # 每个请求单独统计峰值内存（相对请求开始时），反映单请求的临时分配量
+    tracemalloc.start()
+    peaks = []
+    size = 0
+    for rows, scores in cases:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        size += len(fn(rows, scores))
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    for rows, scores in cases:
+        fn(rows, scores)
+    elapsed = time.perf_counter() - t0
+
+    n = len(cases)
+    print(f"{name:<22} {elapsed / n * 1e6:>10.1f} {sum(peaks) / n:>14.0f} {size / n:>10.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--faq", default="datasets/faq.csv")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--topk", type=int, default=5)
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.faq).fillna("")
+    table = FaqTable(df.astype(str).to_dict("records"))
+
+    rng = np.random.default_rng(0)
+    cases = []
+    for _ in range(args.requests):
+        rows = rng.choice(len(table), size=args.topk, replace=False).astype(np.int64)
+        scores = np.sort(rng.uniform(0.4, 0.95, size=args.topk).astype(np.float32))[::-1]
+        cases.append((rows, scores))
+
+    print(f"rows={len(table)} requests={args.requests} topk={args.topk}")
+    print(f"{'path':<22} {'us/req':>10} {'peak B/req':>14} {'resp B':>10}")
+    measure("legacy dict+validate", lambda r, s: legacy_path(table, r, s), cases)
+    measure("table view", lambda r, s: new_path(table, r, s), cases)
+    measure("table view, no answers", lambda r, s: new_path(table, r, s, with_answer=False), cases)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import os, sys, time, json, argparse, glob, platform, subprocess
+from typing import List, Optional
+
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# 检索回归基准：同一份评测集、同一套统计口径，对比每个性能改动的准确率和延迟
+# 一次运行 = 一个配置（embedding 模型 / 索引后端 / topk / 精排开关）；配置通过环境变量生效，
+# 所以要在 import app 之前设置好
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--test_csv", default="reports/queries_test.csv")
+    ap.add_argument("--embed_model", default=os.getenv("EMBED_MODEL", "BAAI/bge-small-zh-v1.5"))
+    ap.add_argument("--backend", default=os.getenv("INDEX_BACKEND", "chroma"),
+                    help="chroma | fp32 | fp16 | int8 | lexical")
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--rescore", type=int, default=int(os.getenv("INDEX_RESCORE", "4")),
+                    help="float32 rescoring multiplier for fp16/int8; 0 = off")
+    ap.add_argument("--tenant", default=None)
+    ap.add_argument("--warmup", type=int, default=1, help="unmeasured passes over the test set")
+    ap.add_argument("--runs", type=int, default=5, help="measured passes over the test set")
+    ap.add_argument("--out_dir", default="reports/bench")
+    ap.add_argument("--baseline", default="reports/bench/baseline.json")
+    ap.add_argument("--set_baseline", action="store_true", help="store this run as the baseline for its config")
+    ap.add_argument("--baseline_config", default=None,
+                    help="judge the compared configs against this reference config (e.g. the chroma one) "
+                         "instead of their own baselines")
+    ap.add_argument("--configs", nargs="*", default=None,
+                    help="configs to compare/gate; defaults to the config just run, "
+                         "or every config with results under --compare_only")
+    ap.add_argument("--compare_only", action="store_true", help="skip running, compare latest results to baseline")
+    ap.add_argument("--max_acc_drop", type=float, default=0.01, help="allowed absolute drop in top1/topk accuracy")
+    ap.add_argument("--max_lat_increase", type=float, default=0.15, help="allowed relative p50/p95 increase")
+    ap.add_argument("--min_lat_delta_ms", type=float, default=1.0, help="ignore latency changes below this")
+    return ap.parse_args()
+
+
+def config_name(args) -> str:
+    if args.backend == "lexical":
+        name = f"lexical-k{args.topk}"
+    else:
+        model = args.embed_model.rstrip("/").split("/")[-1]
+        # 精排只对量化后端有意义
+        rescore = args.rescore if args.backend in ("fp16", "int8") else 0
+        name = f"{model}-{args.backend}-k{args.topk}-rs{rescore}"
+    return f"{name}-{args.tenant}" if args.tenant else name
+
+
+def percentiles(xs) -> dict:
+    """线性插值分位数；样本全部来自预热之后"""
+    if not xs:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    a = np.asarray(xs, dtype=np.float64)
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {"avg": float(a.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(a.max())}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run(args, name: str) -> dict:
+    os.environ["EMBED_MODEL"] = args.embed_model
+    os.environ["INDEX_BACKEND"] = args.backend
+    os.environ["INDEX_RESCORE"] = str(args.rescore)
+    from app.rag.retriever import get_tenant, search, warmup
+
+    df = pd.read_csv(args.test_csv).dropna(subset=["query", "faq_id"])
+    queries = df["query"].astype(str).tolist()
+    true_ids = df["faq_id"].astype(str).tolist()
+
+    # 冷启动（加载模型 / 索引）单独计时，不混进延迟分位数
+    t0 = time.perf_counter()
+    warmup()
+    get_tenant(args.tenant)
+    cold_ms = (time.perf_counter() - t0) * 1000
+    for _ in range(args.warmup):
+        for q in queries:
+            search(q, topk=args.topk, tenant=args.tenant)
+
+    # 准确率：检索是确定性的，算一遍即可
+    top1 = topk = 0
+    rr = 0.0
+    bad = []
+    for q, t in zip(queries, true_ids):
+        res = search(q, topk=args.topk, tenant=args.tenant)
+        ids = res.ids
+        top1 += int(bool(ids) and ids[0] == t)
+        topk += int(t in ids)
+        rr += 1.0 / (ids.index(t) + 1) if t in ids else 0.0
+        if not ids or ids[0] != t:
+            bad.append({"query": q, "true_faq_id": t, "pred_topk": ",".join(ids),
+                        "top1_score": res.best_score if ids else None})
+
+    # 延迟：重复多轮，每轮单独算分位数，看轮间波动
+    samples, per_run = [], []
+    for _ in range(args.runs):
+        lat = []
+        for q in queries:
+            t0 = time.perf_counter()
+            search(q, topk=args.topk, tenant=args.tenant)
+            lat.append((time.perf_counter() - t0) * 1000)
+        samples += lat
+        per_run.append(percentiles(lat))
+
+    n = len(queries)
+    p95s = [r["p95"] for r in per_run]
+    return {
+        "config": name,
+        "params": {"embed_model": args.embed_model, "backend": args.backend, "topk": args.topk,
+                   "rescore": args.rescore, "tenant": args.tenant},
+        "timestamp": time.strftime("%Y%m%dT%H%M%S"),
+        "commit": git_commit(),
+        "index_version": get_tenant(args.tenant).version,
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "test_csv": args.test_csv,
+        "test_size": n,
+        "warmup_passes": args.warmup,
+        "runs": args.runs,
+        "cold_start_ms": cold_ms,
+        "accuracy": {
+            "top1": top1 / n if n else 0.0,
+            "topk": topk / n if n else 0.0,
+            "mrr": rr / n if n else 0.0,
+        },
+        "latency_ms": percentiles(samples),
+        "latency_runs": {"p95_min": min(p95s), "p95_max": max(p95s)} if p95s else {},
+        "per_run": per_run,
+        "badcases": bad,
+    }
+
+
+def load_json(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def latest_results(out_dir: str) -> dict:
+    latest = {}
+    for path in sorted(glob.glob(os.path.join(out_dir, "*", "*.json"))):
+        r = load_json(path)
+        if r.get("config"):
+            latest[r["config"]] = r  # 文件名是时间戳，排序后最后一个即最新
+    return latest
+
+
+def compare(latest: dict, baseline: dict, args, configs: Optional[List[str]] = None) -> list:
+    # 只比较 configs 里的配置（默认本次跑的那个），reports/bench 下别的配置的旧结果不参与门禁；
+    # 指定参考配置时都和它比（新后端 / 新模型和现役方案放在同一把尺子下），
+    # 参考配置没存过基线就用它最近一次的结果
+    names = list(configs) if configs else sorted(latest)
+    missing = [n for n in names if n not in latest]
+    if missing:
+        raise SystemExit(f"no results for config(s): {', '.join(missing)}")
+    ref = None
+    if args.baseline_config:
+        ref = baseline.get(args.baseline_config) or latest.get(args.baseline_config)
+        if ref is None:
+            raise SystemExit(f"no baseline or result for reference config {args.baseline_config}")
+        # 参考配置本身也列出来（只做对照，和自己比不会标回归）
+        if args.baseline_config in latest and args.baseline_config not in names:
+            names.insert(0, args.baseline_config)
+    rows = []
+    for name in names:
+        cur = latest[name]
+        base = ref if ref is not None else baseline.get(name)
+        row = {"config": name, "vs": args.baseline_config or name, "flags": []}
+        for k in ("top1", "topk"):
+            row[k] = cur["accuracy"][k]
+            if base:
+                row[f"{k}_delta"] = cur["accuracy"][k] - base["accuracy"][k]
+                if row[f"{k}_delta"] < -args.max_acc_drop:
+                    row["flags"].append(f"{k}-accuracy")
+        for k in ("p50", "p95"):
+            row[k] = cur["latency_ms"][k]
+            if base:
+                b = base["latency_ms"][k]
+                delta = cur["latency_ms"][k] - b
+                row[f"{k}_delta"] = delta / b if b else 0.0
+                if delta > args.min_lat_delta_ms and delta > b * args.max_lat_increase:
+                    row["flags"].append(f"{k}-latency")
+        row["status"] = "NO-BASELINE" if not base else ("REGRESSION" if row["flags"] else "ok")
+        rows.append(row)
+    return rows
+
+
+def fmt_delta(row, key, pct=False) -> str:
+    if f"{key}_delta" not in row:
+        return ""
+    d = row[f"{key}_delta"]
+    return f"({d:+.1%})" if pct else f"({d:+.3f})"
+
+
+def print_table(rows: list) -> None:
+    if rows and rows[0]["vs"] != rows[0]["config"]:
+        print(f"(deltas vs {rows[0]['vs']})")
+    print(f"{'config':<40} {'top1':>16} {'topk':>16} {'p50 ms':>17} {'p95 ms':>17}  status")
+    for r in rows:
+        print(f"{r['config']:<40} "
+              f"{r['top1']:>7.3f} {fmt_delta(r, 'top1'):>8} "
+              f"{r['topk']:>7.3f} {fmt_delta(r, 'topk'):>8} "
+              f"{r['p50']:>8.2f} {fmt_delta(r, 'p50', True):>8} "
+              f"{r['p95']:>8.2f} {fmt_delta(r, 'p95', True):>8}  "
+              f"{r['status']}{' ' + ','.join(r['flags']) if r['flags'] else ''}")
+
+
+def main():
+    args = parse_args()
+    name = config_name(args)
+
+    if not args.compare_only:
+        result = run(args, name)
+        cfg_dir = os.path.join(args.out_dir, name)
+        os.makedirs(cfg_dir, exist_ok=True)
+        out = os.path.join(cfg_dir, f"{result['timestamp']}.json")
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        pd.DataFrame(result["badcases"]).to_csv(out[:-5] + ".badcases.csv", index=False)
+
+        lat = result["latency_ms"]
+        print(f"=== {name} (cold start {result['cold_start_ms']:.0f}ms, "
+              f"{args.warmup} warmup + {args.runs} runs x {result['test_size']} queries) ===")
+        print(f"accuracy: " + json.dumps({k: round(v, 4) for k, v in result["accuracy"].items()}))
+        print(f"latency ms: avg={lat['avg']:.2f} p50={lat['p50']:.2f} p95={lat['p95']:.2f} "
+              f"p99={lat['p99']:.2f} max={lat['max']:.2f} "
+              f"(p95 across runs {result['latency_runs']['p95_min']:.2f}-{result['latency_runs']['p95_max']:.2f})")
+        print(f"[OUT] {out}")
+
+        if args.set_baseline:
+            baseline = load_json(args.baseline)
+            baseline[name] = {k: v for k, v in result.items() if k not in ("per_run", "badcases")}
+            os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(baseline, f, ensure_ascii=False, indent=2)
+            print(f"[OK] Baseline updated for {name} -> {args.baseline}")
+
+    # 刚跑完一个配置时只给它把关；--compare_only 不指定 --configs 时看全部配置
+    configs = args.configs or (None if args.compare_only else [name])
+    rows = compare(latest_results(args.out_dir), load_json(args.baseline), args, configs)
+    print("-" * 130)
+    print_table(rows)
+    pd.DataFrame([{**r, "flags": ",".join(r["flags"])} for r in rows]).to_csv(
+        os.path.join(args.out_dir, "compare.csv"), index=False)
+    print(f"[OUT] {os.path.join(args.out_dir, 'compare.csv')}")
+    # CI 里用：有回归就返回非 0
+    if any(r["status"] == "REGRESSION" for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 import argparse
 import os, sys
+import resource
+import time
 # 工作目录添加到Python路径
 sys.path.append(os.getcwd())
 from typing import List, Dict, Any
 
 import pandas as pd
 from dotenv import load_dotenv
-import chromadb
 
-from app.rag.embedder import embed_texts
+from app.rag.embedder import embed_texts, iter_embed_parallel
+from app.rag.quantized import export_collection
+from app.rag.tenants import DEFAULT_TENANT, load_tenants
+from app.rag.vectorstore import collection_parts, get_client, write_index_meta
 
 
 def build_rows(df: pd.DataFrame) -> tuple[List[str], List[str], List[Dict[str, Any]]]:
@@ -42,9 +46,10 @@ def build_rows(df: pd.DataFrame) -> tuple[List[str], List[str], List[Dict[str, A
     return ids, docs, metas
 
 
-def get_collection(chroma_dir: str, name: str, reset: bool):
-    # Chroma 会在目录下生成 sqlite3 文件
-    client = chromadb.PersistentClient(path=chroma_dir)
+def get_collection(name: str, reset: bool):
+    # Chroma 会在 CHROMA_DIR 下生成 sqlite3 文件
+    # 和服务端共用同一个 client（同一路径 + 同一份 Settings），--warm 在同进程里检索时不会冲突
+    client = get_client()
 
     if reset:
         try:
@@ -61,19 +66,47 @@ def get_collection(chroma_dir: str, name: str, reset: bool):
     return col
 
 
+def peak_rss_mb() -> tuple[float, float]:
+    # Linux 上 ru_maxrss 单位是 KB；CHILDREN 统计的是已退出的 worker 进程里最大的那个
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_kb / 1024, child_kb / 1024
+
+
+def upsert_parallel(col, ids, docs, metas, workers: int, batch_size: int, window: int) -> None:
+    # 按窗口边算边写，不用等全部 embedding 算完再一次性 upsert
+    for start, vecs in iter_embed_parallel(docs, workers=workers, batch_size=batch_size, window=window):
+        end = start + len(vecs)
+        col.upsert(
+            ids=ids[start:end],
+            documents=docs[start:end],
+            metadatas=metas[start:end],
+            embeddings=vecs.tolist(),
+        )
+        print(f"[..] Upserted rows {start}-{end - 1}")
+
+
 def main():
     load_dotenv()
 
     ap = argparse.ArgumentParser()
-    ap.add_argument("--faq", default="datasets/faq.csv")
+    ap.add_argument("--faq", default=None, help="defaults to the tenant's faq_csv")
+    ap.add_argument("--tenant", default=DEFAULT_TENANT, help="build the collection registered for this tenant")
     ap.add_argument("--reset", action="store_true", help="delete and rebuild collection")
     ap.add_argument("--query", default=None, help="run a test query after indexing")
     ap.add_argument("--topk", type=int, default=int(os.getenv("TOPK", "5")))
     ap.add_argument("--batch_size", type=int, default=32)
+    ap.add_argument("--workers", type=int, default=1, help="embedding processes; >1 enables multi-process pool")
+    ap.add_argument("--window", type=int, default=4096, help="rows per streamed upsert in parallel mode")
+    ap.add_argument("--no_export", action="store_true", help="skip exporting vectors for the fp16/int8 backend")
+    ap.add_argument("--warm", action="store_true", help="preload direct answers into Redis under the new index version")
     args = ap.parse_args()
 
     chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
-    col_name = os.getenv("CHROMA_COLLECTION", "hr_faq")
+    # 每个租户一个 collection（config/tenants.json），默认租户即 CHROMA_COLLECTION
+    spec = load_tenants()[args.tenant]
+    col_name = spec.collection
+    args.faq = args.faq or spec.faq_csv or "datasets/faq.csv"
 
     df = pd.read_csv(args.faq)
     assert {"faq_id", "title", "question", "answer"}.issubset(df.columns), "faq.csv missing required columns"
@@ -83,15 +116,41 @@ def main():
     print(f"[INFO] Loading FAQ rows: {len(ids)}")
     print(f"[INFO] Chroma dir: {chroma_dir}, collection: {col_name}")
 
-    col = get_collection(chroma_dir, col_name, reset=args.reset)
+    col = get_collection(col_name, reset=args.reset)
 
-    # 生成 embeddings
-    embeddings = embed_texts(docs, batch_size=args.batch_size)
+    t0 = time.perf_counter()
+    if args.workers > 1:
+        upsert_parallel(col, ids, docs, metas, args.workers, args.batch_size, args.window)
+    else:
+        # 生成 embeddings
+        embeddings = embed_texts(docs, batch_size=args.batch_size)
 
-    # 写入（upsert 可以重复跑）
-    col.upsert(ids=ids, documents=docs, metadatas=metas, embeddings=embeddings)
+        # 写入（upsert 可以重复跑）
+        col.upsert(ids=ids, documents=docs, metadatas=metas, embeddings=embeddings)
+    elapsed = time.perf_counter() - t0
     print(f"[OK] Upserted {len(ids)} docs into Chroma collection: {col_name}")
 
+    # 版本按整个 collection 的内容算（含答案 / 标签 / 已导入的长文档），它同时是 /ask 缓存的命名空间
+    version = write_index_meta(chroma_dir, col_name, collection_parts(col))
+    print(f"[OK] Index version: {version}")
+
+    # 导出 float32 向量 + metadata，供 INDEX_BACKEND=fp16/int8 加载
+    if not args.no_export:
+        n = export_collection(col, chroma_dir, col_name)
+        print(f"[OK] Exported {n} vectors for NumPy backend")
+
+    rss_self, rss_child = peak_rss_mb()
+    print(
+        f"[PERF] workers={args.workers} elapsed={elapsed:.2f}s "
+        f"throughput={len(ids) / elapsed if elapsed else 0:.1f} texts/s "
+        f"peak_rss_main={rss_self:.0f}MB peak_rss_worker={rss_child:.0f}MB"
+    )
+
+    # 新索引版本的缓存命名空间是空的，切流量前先把直通答案批量灌进 Redis
+    if args.warm:
+        from scripts.warm_cache import warm
+        warm(args.faq, ["datasets/queries.csv"], args.topk, tenant=args.tenant)
+
     # 跑一个查询看看 topK
     if args.query:
         q = args.query.strip()
@@ -0,0 +1,150 @@
+import os, sys, json, time, argparse, hashlib
+from dataclasses import replace
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.api.routing import RoutingConfig, load_routing_config
+from app.rag.retriever import search, warmup
+from app.rag.vectorstore import get_index_version
+
+
+def frange(lo, hi, step):
+    out, x = [], lo
+    while x <= hi + 1e-9:
+        out.append(round(x, 4))
+        x += step
+    return out
+
+
+def collect(queries, true_ids, topk):
+    """每条 query 只检索一次，后面的阈值扫描都在这份结果上离线计算"""
+    rows = []
+    for q, t in zip(queries, true_ids):
+        res = search(q, topk=topk)
+        ids = res.ids
+        rows.append({
+            "top1": res.best_score,
+            "top2": float(res.scores[1]) if len(res) > 1 else 0.0,
+            "top1_ok": bool(ids) and ids[0] == t,
+            "in_ctx": t in ids[:3],
+            "positive": t is not None,
+        })
+    return rows
+
+
+def evaluate(cfg: RoutingConfig, rows, lat):
+    n = len(rows)
+    mix = {"direct": 0, "llm": 0, "fallback": 0}
+    correct = direct_ok = false_answer = 0
+    for r in rows:
+        mode = cfg.route(r["top1"], r["top2"])
+        mix[mode] += 1
+        if not r["positive"]:
+            # 库外问题：除了兜底都算答非所问
+            false_answer += mode != "fallback"
+            continue
+        if mode == "direct":
+            direct_ok += r["top1_ok"]
+            correct += r["top1_ok"]
+        elif mode == "llm":
+            # LLM 能答对的前提是正确 FAQ 在上下文里
+            correct += r["in_ctx"]
+    n_pos = sum(r["positive"] for r in rows)
+    n_neg = n - n_pos
+    return {
+        "direct_rate": mix["direct"] / n,
+        "llm_rate": mix["llm"] / n,
+        "fallback_rate": mix["fallback"] / n,
+        "direct_precision": direct_ok / mix["direct"] if mix["direct"] else 1.0,
+        "answer_accuracy": correct / n_pos if n_pos else 0.0,
+        "false_answer_rate": false_answer / n_neg if n_neg else 0.0,
+        "expected_latency_ms": sum(mix[m] * lat[m] for m in mix) / n,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--test_csv", default="reports/queries_test.csv")
+    ap.add_argument("--negatives", default=None, help="csv of out-of-scope queries (query column)")
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--lat_direct", type=float, default=60, help="expected ms per direct answer")
+    ap.add_argument("--lat_llm", type=float, default=3000, help="expected ms per llm answer")
+    ap.add_argument("--lat_fallback", type=float, default=60)
+    ap.add_argument("--min_direct_precision", type=float, default=0.95)
+    ap.add_argument("--max_accuracy_drop", type=float, default=0.0, help="allowed drop vs current config")
+    ap.add_argument("--max_false_answer", type=float, default=0.2)
+    ap.add_argument("--out", default="config/routing.json")
+    ap.add_argument("--sweep_csv", default="reports/routing_sweep.csv")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.test_csv).dropna(subset=["query", "faq_id"])
+    queries = df["query"].astype(str).tolist()
+    true_ids = df["faq_id"].astype(str).tolist()
+    if args.negatives:
+        neg = pd.read_csv(args.negatives).dropna(subset=["query"])["query"].astype(str).tolist()
+        queries += neg
+        true_ids += [None] * len(neg)
+
+    warmup()
+    rows = collect(queries, true_ids, args.topk)
+    lat = {"direct": args.lat_direct, "llm": args.lat_llm, "fallback": args.lat_fallback}
+
+    current = load_routing_config()
+    base = evaluate(current, rows, lat)
+
+    results = []
+    for d in frange(0.60, 0.95, 0.01):
+        for m in frange(0.30, 0.60, 0.05):
+            if m >= d:
+                continue
+            for margin in [0.0, 0.03, 0.05, 0.08, 0.10]:
+                floors = [1.01] if margin == 0 else [f for f in frange(0.55, 0.80, 0.05) if m <= f < d]
+                for floor in floors:
+                    cfg = RoutingConfig(direct_threshold=d, min_threshold=m, margin=margin, margin_floor=floor)
+                    results.append((cfg, evaluate(cfg, rows, lat)))
+
+    ok = [
+        (c, r) for c, r in results
+        if r["direct_precision"] >= args.min_direct_precision
+        and r["answer_accuracy"] >= base["answer_accuracy"] - args.max_accuracy_drop
+        and r["false_answer_rate"] <= args.max_false_answer
+    ]
+    if not ok:
+        raise SystemExit("[FAIL] no threshold combination meets the constraints; keep current config")
+    # 先看预期延迟，再看准确率，最后偏向更保守（更高）的直通阈值
+    best_cfg, best = min(ok, key=lambda cr: (cr[1]["expected_latency_ms"], -cr[1]["answer_accuracy"], -cr[0].direct_threshold))
+
+    os.makedirs(os.path.dirname(args.sweep_csv) or ".", exist_ok=True)
+    pd.DataFrame([{**c.to_dict(), **r} for c, r in results]).drop(columns=["version"]).to_csv(args.sweep_csv, index=False)
+
+    stamp = time.strftime("%Y%m%d%H%M")
+    digest = hashlib.sha1(json.dumps(best_cfg.to_dict(), sort_keys=True).encode()).hexdigest()[:6]
+    best_cfg = replace(best_cfg, version=f"r{stamp}-{digest}")
+    out = {
+        **best_cfg.to_dict(),
+        "calibrated_at": stamp,
+        "index_version": get_index_version(),
+        "test_csv": args.test_csv,
+        "test_size": len(rows),
+        "metrics": best,
+        "previous": {**current.to_dict(), "metrics": base},
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+
+    print("=== Routing Calibration ===")
+    print(f"candidates={len(results)} feasible={len(ok)}")
+    for name, cfg, m in [("current", current, base), ("chosen", best_cfg, best)]:
+        print(f"[{name}] direct>={cfg.direct_threshold} min>={cfg.min_threshold} "
+              f"margin={cfg.margin}@{cfg.margin_floor}")
+        print("   " + json.dumps({k: round(v, 4) for k, v in m.items()}))
+    print(f"[OUT] {args.out}")
+    print(f"[OUT] {args.sweep_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os, sys, time, json, argparse
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.rag.embedder import encode
+from app.rag.quantized import QuantizedIndex, export_paths
+from app.rag.retriever import normalize_query
+
+# (名称, dtype, rescore 倍数)
+CONFIGS = [
+    ("fp32", "fp32", 0),
+    ("fp16", "fp16", 0),
+    ("fp16+rescore", "fp16", 4),
+    ("int8", "int8", 0),
+    ("int8+rescore", "int8", 4),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--test_csv", default="reports/queries_test.csv")
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=20, help="search repeats per query for stable latency")
+    ap.add_argument("--out", default="reports/quant_eval.json")
+    args = ap.parse_args()
+
+    chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
+    col_name = os.getenv("CHROMA_COLLECTION", "hr_faq")
+    vec_path, rows_path = export_paths(chroma_dir, col_name)
+    exact = np.load(vec_path, mmap_mode="r")
+    with open(rows_path, "r", encoding="utf-8") as f:
+        row_ids = [str(r.get("faq_id")) for r in json.load(f)]
+
+    df = pd.read_csv(args.test_csv).dropna(subset=["query", "faq_id"])
+    queries = [normalize_query(q) for q in df["query"].astype(str)]
+    true_ids = df["faq_id"].astype(str).tolist()
+
+    # query embedding 只算一次，下面只比较检索本身
+    q_vecs = encode(queries, batch_size=32, show_progress_bar=False)
+
+    results = []
+    for name, dtype, rescore in CONFIGS:
+        index = QuantizedIndex(exact, dtype=dtype, exact=exact)
+        top1 = top3 = 0
+        for qv, t in zip(q_vecs, true_ids):
+            idx, _ = index.search(qv, args.topk, rescore=rescore)
+            pred = [row_ids[i] for i in idx]
+            top1 += int(bool(pred) and pred[0] == t)
+            top3 += int(t in pred)
+
+        lat = []
+        for _ in range(args.repeat):
+            for qv in q_vecs:
+                t0 = time.perf_counter()
+                index.search(qv, args.topk, rescore=rescore)
+                lat.append((time.perf_counter() - t0) * 1000)
+        lat.sort()
+
+        n = len(queries)
+        results.append({
+            "config": name,
+            "index_bytes": index.nbytes,
+            "memory_ratio_vs_fp32": index.nbytes / max(1, exact.nbytes),
+            "top1_accuracy": top1 / n if n else 0,
+            "top3_accuracy": top3 / n if n else 0,
+            "search_ms_avg": sum(lat) / len(lat) if lat else 0,
+            "search_ms_p95": float(np.percentile(lat, 95)) if lat else 0,
+        })
+
+    summary = {"rows": len(row_ids), "dim": int(exact.shape[1]) if exact.ndim == 2 else 0,
+               "test_size": len(queries), "results": results}
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print("=== Quantized Index Eval ===")
+    print(f"{'config':<14} {'MB':>8} {'ratio':>6} {'top1':>6} {'top3':>6} {'avg ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['config']:<14} {r['index_bytes'] / 1e6:>8.3f} {r['memory_ratio_vs_fp32']:>6.2f} "
+              f"{r['top1_accuracy']:>6.3f} {r['top3_accuracy']:>6.3f} {r['search_ms_avg']:>8.3f} {r['search_ms_p95']:>8.3f}")
+    print(f"[OUT] {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,18 @@
 import os, sys, time, json, argparse
 import pandas as pd
+import numpy as np
 
 sys.path.append(os.getcwd())
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from app.rag.vectorstore import get_collection
-from app.rag.retriever import retrieve
+from app.rag.retriever import retrieve, warmup
 
 def p95(xs):
-    xs = sorted(xs)
+    # 线性插值；原来的 int(n*0.95)-1 在小样本下取到的是 p93 左右
     if not xs: return 0.0
-    i = max(0, min(len(xs)-1, int(len(xs)*0.95)-1))
-    return xs[i]
+    return float(np.percentile(xs, 95))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -27,7 +26,9 @@ def main():
     queries = df["query"].astype(str).tolist()
     true_ids = df["faq_id"].astype(str).tolist()
 
-    get_collection()
+    # 模型 / 索引加载（秒级）不算进逐条延迟，否则 avg 被一条冷启动拉高、p95 反而比 avg 低
+    # 稳定的分位数和多轮对比用 scripts/bench_retrieval.py
+    warmup()
 
     top1_ok = 0
     top3_ok = 0
@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import os, sys
+# 工作目录添加到Python路径
+sys.path.append(os.getcwd())
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from app.rag.chunker import Chunk, NearDupFilter, iter_chunks
+from app.rag.embedder import embed_texts
+from app.rag.tenants import DEFAULT_TENANT, load_tenants
+from app.rag.vectorstore import collection_parts, write_index_meta
+from scripts.build_index import get_collection
+
+DOC_EXTS = (".md", ".markdown", ".txt", ".html", ".htm")
+
+
+def list_files(paths: List[str]) -> List[str]:
+    files: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith(DOC_EXTS))
+        elif p.lower().endswith(DOC_EXTS):
+            files.append(p)
+    # 排序保证 chunk id 和 checkpoint 在多次运行间稳定
+    return sorted(files)
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    # 先写临时文件再 rename，中途被 kill 也不会留下半个 json
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_row(c: Chunk) -> tuple[str, str, Dict[str, Any]]:
+    src = os.path.relpath(c.source)
+    title = c.heading or os.path.splitext(os.path.basename(src))[0]
+    chunk_id = f"{src}#{c.index}"
+    doc = f"{title}\n{c.text}".strip()
+    # 字段和 FAQ 行保持一致，retrieve / generator 不用区分来源
+    meta = {
+        "faq_id": chunk_id,
+        "title": title,
+        "question": title,
+        "answer": c.text,
+        "tags": "doc",
+        "source": src,
+        "offset": c.offset,
+        "chunk_index": c.index,
+    }
+    return chunk_id, doc, meta
+
+
+def flush(col, batch: List[tuple], batch_size: int) -> None:
+    ids = [b[0] for b in batch]
+    docs = [b[1] for b in batch]
+    metas = [b[2] for b in batch]
+    embeddings = embed_texts(docs, batch_size=batch_size)
+    col.upsert(ids=ids, documents=docs, metadatas=metas, embeddings=embeddings)
+
+
+def main():
+    load_dotenv()
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="+", help="files or directories (.md/.txt/.html)")
+    ap.add_argument("--reset", action="store_true", help="delete and rebuild collection")
+    ap.add_argument("--tenant", default=DEFAULT_TENANT, help="ingest into the collection registered for this tenant")
+    ap.add_argument("--max_tokens", type=int, default=384, help="token budget per chunk")
+    ap.add_argument("--overlap", type=int, default=64, help="overlap tokens between chunks")
+    ap.add_argument("--dedup_distance", type=int, default=3, help="simhash hamming distance for near-dup")
+    ap.add_argument("--upsert_size", type=int, default=256, help="chunks per embed+upsert round")
+    ap.add_argument("--batch_size", type=int, default=32)
+    ap.add_argument("--checkpoint", default=None, help="defaults to reports/ingest_checkpoint[.<tenant>].json")
+    args = ap.parse_args()
+
+    chroma_dir = os.getenv("CHROMA_DIR", "./vectorstore")
+    col_name = load_tenants()[args.tenant].collection
+
+    # 不同租户的进度分开记，避免同名文件互相跳过
+    suffix = "" if args.tenant == DEFAULT_TENANT else f".{args.tenant}"
+    args.checkpoint = args.checkpoint or f"reports/ingest_checkpoint{suffix}.json"
+
+    files = list_files(args.paths)
+    print(f"[INFO] Files to ingest: {len(files)}")
+    print(f"[INFO] Chroma dir: {chroma_dir}, collection: {col_name}")
+
+    col = get_collection(col_name, reset=args.reset)
+
+    # reset 之后旧进度没意义
+    state = {} if args.reset else load_checkpoint(args.checkpoint)
+    os.makedirs(os.path.dirname(args.checkpoint) or ".", exist_ok=True)
+    dedup = NearDupFilter(max_distance=args.dedup_distance)
+
+    total_new = total_dup = 0
+    for path in files:
+        key = os.path.relpath(path)
+        digest = file_sha1(path)
+        prev = state.get(key, {})
+        if prev and prev.get("sha1") != digest:
+            # 文件改过：旧 chunk（包括变短后多出来的尾巴）整体删掉再重新导入
+            col.delete(where={"source": key})
+            print(f"[..] {key}: content changed, removed old chunks")
+            prev = {}
+        done_upto = prev.get("next_chunk", 0)
+        if prev.get("done"):
+            # 没变的文件也要把 chunk 喂给去重器，跨文件去重才和首次导入一致
+            for c in iter_chunks(path, max_tokens=args.max_tokens, overlap_tokens=args.overlap):
+                dedup.seen(c.text)
+            print(f"[SKIP] {key} (unchanged, already ingested)")
+            continue
+
+        batch: List[tuple] = []
+        n_new = n_dup = 0
+        last_index = -1
+        for c in iter_chunks(path, max_tokens=args.max_tokens, overlap_tokens=args.overlap):
+            last_index = c.index
+            # 已提交过的 chunk 只喂给去重器，不再 embed
+            if dedup.seen(c.text):
+                n_dup += 1
+                continue
+            if c.index < done_upto:
+                continue
+
+            batch.append(chunk_row(c))
+            n_new += 1
+            if len(batch) >= args.upsert_size:
+                flush(col, batch, args.batch_size)
+                batch = []
+                state[key] = {"sha1": digest, "next_chunk": c.index + 1, "done": False}
+                save_checkpoint(args.checkpoint, state)
+                print(f"[..] {key}: upserted up to chunk {c.index}")
+
+        if batch:
+            flush(col, batch, args.batch_size)
+        state[key] = {"sha1": digest, "next_chunk": last_index + 1, "done": True}
+        save_checkpoint(args.checkpoint, state)
+
+        total_new += n_new
+        total_dup += n_dup
+        print(f"[OK] {key}: chunks={last_index + 1} upserted={n_new} near_dup_skipped={n_dup}")
+
+    # 和 build_index 同一算法：按整个 collection（FAQ 行 + 文档 chunk）的内容算版本，谁最后跑都一样
+    version = write_index_meta(chroma_dir, col_name, collection_parts(col))
+    print(f"[OK] Index version: {version}")
+    print(f"[DONE] upserted={total_new} near_dup_skipped={total_dup} collection={col_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os, sys
+from collections import Counter
+from typing import Dict, List
+
+# 工作目录添加到Python路径
+sys.path.append(os.getcwd())
+
+import pandas as pd
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.api.routing import load_routing_config
+from app.rag.answer_store import AnswerStore, answer_store_path, rows_fingerprint, store_key
+from app.rag.context import build_context
+from app.rag.generator import llm_generator
+from app.rag.retriever import normalize_query, retrieve
+from app.rag.tenants import DEFAULT_TENANT, load_tenants
+from app.rag.vectorstore import get_index_version
+
+
+def load_queries(paths: List[str], tenant: str = DEFAULT_TENANT) -> Counter:
+    """支持 csv（query 列，比如 datasets/queries.csv）和 jsonl 访问日志（query 字段，只取该租户的记录）"""
+    counts: Counter = Counter()
+    for p in paths:
+        if p.endswith(".jsonl"):
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except Exception:
+                        continue
+                    q = rec.get("query")
+                    # 旧日志没有 tenant 字段，都算默认租户
+                    if q and rec.get("tenant", DEFAULT_TENANT) == tenant:
+                        counts[normalize_query(q)] += 1
+        else:
+            df = pd.read_csv(p).dropna(subset=["query"])
+            counts.update(normalize_query(q) for q in df["query"].astype(str))
+    counts.pop("", None)
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tenant", default=DEFAULT_TENANT)
+    ap.add_argument("--queries", nargs="+", default=["datasets/queries.csv"], help="csv or access-log jsonl")
+    ap.add_argument("--top", type=int, default=200, help="only replay the N most frequent queries")
+    ap.add_argument("--min_count", type=int, default=1)
+    ap.add_argument("--include_rewrite", action="store_true",
+                    help="also precompute for queries routed to direct (rewrite=true path)")
+    ap.add_argument("--dry_run", action="store_true", help="only report what would be generated")
+    args = ap.parse_args()
+
+    col_name = load_tenants()[args.tenant].collection
+    version = get_index_version(col_name)
+    # 和线上用同一份路由配置，才能判断哪些 query 会落到 llm
+    routing = load_routing_config()
+    store = AnswerStore(answer_store_path(col_name))
+    print(f"[INFO] Tenant: {args.tenant}, index version: {version}, existing answers: {len(store)}")
+
+    counts = load_queries(args.queries, args.tenant)
+    hot = [(q, n) for q, n in counts.most_common(args.top) if n >= args.min_count]
+    print(f"[INFO] Replaying {len(hot)} queries (distinct total: {len(counts)})")
+
+    # 改写 query 往往落到同一组资料上，按资料分组只生成一次
+    groups: Dict[str, Dict] = {}
+    for q, n in hot:
+        hits = retrieve(q, tenant=args.tenant)
+        if not hits:
+            continue
+        top1 = float(hits[0].get("score", 0.0))
+        top2 = float(hits[1].get("score", 0.0)) if len(hits) > 1 else 0.0
+        if routing.route(top1, top2, rewrite=args.include_rewrite) != "llm":
+            continue
+        packed = build_context(hits)
+        key = store_key(version, [d.get("faq_id") for d in packed.docs])
+        g = groups.setdefault(key, {"docs": packed.docs, "queries": [], "count": 0})
+        g["queries"].append(q)
+        g["count"] += n
+
+    kept = reused = generated = failed = 0
+    for key, g in sorted(groups.items(), key=lambda kv: -kv[1]["count"]):
+        docs = g["docs"]
+        fp = rows_fingerprint(docs)
+        old = store.answers.get(key)
+        if old and old.get("fingerprint") == fp:
+            kept += 1
+            continue
+        prev = store.find_reusable([d.get("faq_id") for d in docs], fp)
+        if prev:
+            store.put(version, docs, prev["answer"], g["queries"])
+            reused += 1
+            continue
+        if args.dry_run:
+            print(f"[DRY] would generate {key} (queries={g['count']})")
+            continue
+        try:
+            # 用出现次数最多的那个问法作为代表
+            answer = llm_generator.generate(g["queries"][0], docs, strict=True)
+        except Exception as e:
+            print(f"[FAIL] {key}: {e}")
+            failed += 1
+            continue
+        store.put(version, docs, answer, g["queries"])
+        generated += 1
+        print(f"[GEN] {key} (queries={g['count']})")
+
+    if not args.dry_run:
+        store.save(version)
+    print(f"[DONE] groups={len(groups)} unchanged={kept} reused={reused} generated={generated} failed={failed}")
+    print(f"[OUT] {store.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os, sys, json, argparse, subprocess, time
+from collections import defaultdict
+
+# 在子进程里 import app.main，用 -X importtime 拿到每个模块的 import 耗时
+
+HEAVY = ["torch", "sentence_transformers", "transformers", "chromadb", "redis", "requests", "pandas", "numpy"]
+
+PROBE = (
+    "import sys, json, time; t0 = time.perf_counter(); import app.main; "
+    "t1 = time.perf_counter(); "
+    "print(json.dumps({'import_s': t1 - t0, 'heavy': [m for m in %r if m in sys.modules]}))"
+)
+
+
+def parse_importtime(stderr: str):
+    """
+    返回 {包名: 自身耗时微秒}：第三方库按顶层包汇总，app 内模块逐个列出。
+    用 self 而不是 cumulative，嵌套 import 不会被重复计算。
+    """
+    per_pkg = defaultdict(int)
+    for line in stderr.splitlines():
+        # 格式：import time:  self_us |  cumulative_us | <缩进>module
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].split(":")[1].strip())
+        except ValueError:
+            continue  # 表头
+        mod = parts[2].strip()
+        key = mod if mod.startswith("app.") or mod == "app" else mod.split(".")[0]
+        per_pkg[key] += self_us
+    return per_pkg
+
+
+def profile(env_overrides, top):
+    env = dict(os.environ, **env_overrides)
+    env["WARMUP"] = "0"  # 只量 import，不触发 lifespan
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE % (HEAVY,)],
+        env=env, cwd=os.getcwd(), capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"import app.main failed under {env_overrides}")
+
+    info = json.loads(proc.stdout.strip().splitlines()[-1])
+    per_pkg = parse_importtime(proc.stderr)
+    ranked = sorted(per_pkg.items(), key=lambda kv: -kv[1])[:top]
+    return {"env": env_overrides, "wall_s": wall, "import_s": info["import_s"],
+            "heavy_loaded": info["heavy"], "top_packages_ms": {k: v / 1000 for k, v in ranked}}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", default="reports/startup_profile.json")
+    args = ap.parse_args()
+
+    profiles = [
+        profile({"SERVE_MODE": "full", "INDEX_BACKEND": "chroma"}, args.top),
+        profile({"SERVE_MODE": "full", "INDEX_BACKEND": "lexical"}, args.top),
+        profile({"SERVE_MODE": "cache-only"}, args.top),
+    ]
+
+    for p in profiles:
+        print(f"=== {p['env']} ===")
+        print(f"import app.main: {p['import_s'] * 1000:.0f} ms (process wall {p['wall_s'] * 1000:.0f} ms)")
+        print(f"heavy modules loaded: {', '.join(p['heavy_loaded']) or '-'}")
+        for pkg, ms in p["top_packages_ms"].items():
+            print(f"  {pkg:<28} {ms:>9.1f} ms")
+        print()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=2)
+    print(f"[OUT] {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import concurrent.futures
+import csv
+import glob
+import json
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+# 按访问日志的原始时间间隔（可加速）重放请求，或从日志里挖热门问题
+
+
+def load_log(pattern: str, limit: int = 0):
+    """支持轮转文件：logs/access.jsonl* 按时间戳合并排序"""
+    records = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except Exception:
+                    continue
+                if r.get("query") and r.get("ts"):
+                    records.append(r)
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+def pct(xs, p):
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def mine_hot(records, top, out):
+    counts = Counter(r["query"] for r in records)
+    modes = defaultdict(Counter)
+    for r in records:
+        modes[r["query"]][r.get("mode", "unknown")] += 1
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        # query 列可以直接喂给 precompute_answers.py --queries
+        w = csv.writer(f)
+        w.writerow(["query", "count", "top_mode"])
+        for q, n in counts.most_common(top):
+            w.writerow([q, n, modes[q].most_common(1)[0][0]])
+    print(f"[OK] {min(top, len(counts))} hot queries (distinct {len(counts)}) -> {out}")
+
+
+def replay(records, url, speed, concurrency, keep_clients, timeout):
+    session = requests.Session()
+    lock = threading.Lock()
+    results = []
+
+    def send(r, due):
+        lag = time.perf_counter() - due
+        headers = {"X-Client-Id": str(r["client"])} if keep_clients and r.get("client") else {}
+        if r.get("tenant"):
+            headers["X-Tenant"] = str(r["tenant"])
+        body = {"question": r["query"], "rewrite": bool(r.get("rewrite")),
+                "candidate_answers": bool(r.get("candidate_answers", True))}
+        t0 = time.perf_counter()
+        try:
+            resp = session.post(url, json=body, headers=headers, timeout=timeout)
+            status = resp.status_code
+            mode = resp.json().get("mode", "unknown") if status == 200 else f"http_{status}"
+        except Exception:
+            status, mode = "error", "error"
+        latency = (time.perf_counter() - t0) * 1000
+        with lock:
+            results.append({"status": status, "mode": mode, "latency": latency, "lag": lag * 1000,
+                            "orig_mode": r.get("mode"), "orig_ms": r.get("total_ms")})
+
+    ts0 = records[0]["ts"]
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for r in records:
+            due = start + (r["ts"] - ts0) / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            ex.submit(send, r, due)
+    total = time.perf_counter() - start
+    return results, total
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log", default="logs/access.jsonl*", help="glob of access log files")
+    ap.add_argument("--url", default="http://127.0.0.1:8000/ask")
+    ap.add_argument("--speed", type=float, default=1.0, help="time scale: 2 = replay twice as fast")
+    ap.add_argument("--concurrency", type=int, default=64, help="max in-flight requests")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--keep_clients", action="store_true", help="send original client as X-Client-Id")
+    ap.add_argument("--hot", type=int, default=0, help="only mine top-N hot queries, no replay")
+    ap.add_argument("--hot_out", default="reports/hot_queries.csv")
+    args = ap.parse_args()
+
+    records = load_log(args.log, args.limit)
+    if not records:
+        raise SystemExit(f"no records in {args.log}")
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"[INFO] {len(records)} records over {span:.1f}s (original rate {len(records) / max(span, 1e-9):.2f} req/s)")
+
+    if args.hot:
+        mine_hot(records, args.hot, args.hot_out)
+        return
+
+    print(f"[INFO] Replaying at {args.speed}x -> {args.url}")
+    results, total = replay(records, args.url, args.speed, args.concurrency, args.keep_clients, args.timeout)
+
+    ok = [r for r in results if r["status"] == 200]
+    print("-" * 72)
+    print(f"requests={len(results)} ok={len(ok)} error_rate={1 - len(ok) / len(results):.2%} "
+          f"wall={total:.1f}s rps={len(results) / total:.2f}")
+    print(f"schedule lag p95={pct([r['lag'] for r in results], 95):.1f}ms (high lag = client-side saturation)")
+    print(f"{'mode':<12} {'n':>6} {'avg':>9} {'p50':>9} {'p95':>9} {'p99':>9}   {'orig p95':>9}")
+    by_mode = defaultdict(list)
+    for r in ok:
+        by_mode[r["mode"]].append(r)
+    for mode, rs in sorted(by_mode.items(), key=lambda kv: -len(kv[1])):
+        lat = [r["latency"] for r in rs]
+        orig = [r["orig_ms"] for r in rs if r["orig_ms"] is not None]
+        print(f"{mode:<12} {len(rs):>6} {statistics.mean(lat):>9.1f} {pct(lat, 50):>9.1f} "
+              f"{pct(lat, 95):>9.1f} {pct(lat, 99):>9.1f}   {pct(orig, 95):>9.1f}")
+    changed = sum(1 for r in ok if r["orig_mode"] and r["mode"] != r["orig_mode"])
+    print(f"mode changed vs recorded: {changed}/{len(ok)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import os, sys
+import time
+from typing import List, Optional
+
+# 工作目录添加到Python路径
+sys.path.append(os.getcwd())
+
+import pandas as pd
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.api.routing import load_routing_config
+from app.api.schemas import AskResponse, Candidate
+from app.cache.redis_cache import ask_cache_key, cache_set_many, get_redis
+from app.rag.retriever import get_registry, normalize_query, search_many
+from app.rag.tenants import DEFAULT_TENANT
+from app.rag.vectorstore import get_index_version
+
+
+def load_questions(faq_csv: str, query_csvs: List[str]) -> List[str]:
+    """FAQ 标准问法 + 已知改写问法（queries.csv / 热门问题 csv 的 query 列），去重保序"""
+    qs: List[str] = []
+    if faq_csv and os.path.exists(faq_csv):
+        qs += pd.read_csv(faq_csv).dropna(subset=["question"])["question"].astype(str).tolist()
+    for p in query_csvs:
+        if not os.path.exists(p):
+            print(f"[WARN] skip missing {p}")
+            continue
+        qs += pd.read_csv(p).dropna(subset=["query"])["query"].astype(str).tolist()
+    seen = set()
+    out = []
+    for q in map(normalize_query, qs):
+        if q and q not in seen:
+            seen.add(q)
+            out.append(q)
+    return out
+
+
+def warm(
+    faq_csv: Optional[str],
+    query_csvs: List[str],
+    topk: int,
+    ttl: int = 3600,
+    dry_run: bool = False,
+    tenant: str = DEFAULT_TENANT,
+) -> int:
+    """只预热 direct 应答：内容完全由知识库决定，和线上 /ask 生成的一模一样"""
+    if not dry_run and get_redis() is None:
+        print("[WARN] Redis unavailable (REDIS_URL unset or unreachable), nothing to warm")
+        return 0
+
+    spec = get_registry().specs[tenant]
+    version = get_index_version(spec.collection)
+    routing = load_routing_config()
+    questions = load_questions(faq_csv or spec.faq_csv, query_csvs)
+    print(f"[INFO] Tenant: {tenant}, index version: {version}, routing: {routing.version}, questions: {len(questions)}")
+
+    t0 = time.perf_counter()
+    results = search_many(questions, topk=topk, tenant=tenant)
+    t_search = time.perf_counter() - t0
+
+    items = []
+    for q, hits in zip(questions, results):
+        top2 = float(hits.scores[1]) if len(hits) > 1 else 0.0
+        if not len(hits) or routing.route(hits.best_score, top2) != "direct":
+            continue
+        # 两种响应形态（candidates 带 / 不带 answer）都预热
+        for with_answer in (True, False):
+            resp = AskResponse.direct(hits, Candidate.from_result(hits, with_answer=with_answer))
+            key = ask_cache_key(tenant, version, routing.version, q, False, with_answer)
+            items.append((key, resp.model_dump(), ttl))
+
+    direct = len(items) // 2
+    print(f"[INFO] direct={direct}/{len(questions)} search={t_search:.2f}s")
+    if dry_run:
+        return 0
+
+    t0 = time.perf_counter()
+    n = cache_set_many(items)
+    print(f"[OK] Warmed {n} keys in {time.perf_counter() - t0:.2f}s (pipelined)")
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tenant", default=DEFAULT_TENANT)
+    ap.add_argument("--faq", default=None, help="canonical questions; defaults to the tenant's faq_csv")
+    ap.add_argument("--queries", nargs="*", default=["datasets/queries.csv"],
+                    help="csv files with a query column (paraphrases, reports/hot_queries.csv)")
+    ap.add_argument("--topk", type=int, default=int(os.getenv("TOPK", "5")))
+    ap.add_argument("--ttl", type=int, default=3600, help="same as /ask direct answers")
+    ap.add_argument("--dry_run", action="store_true", help="only report how many keys would be written")
+    args = ap.parse_args()
+
+    warm(args.faq, args.queries, args.topk, ttl=args.ttl, dry_run=args.dry_run, tenant=args.tenant)
+
+
+if __name__ == "__main__":
+    main()